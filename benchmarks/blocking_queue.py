@@ -0,0 +1,74 @@
+"""Contention benchmark for part2.chapter10.BlockingPriorityQueue. A fixed number of items
+is pushed through a bounded queue by several producer threads and drained by several
+consumer threads, once with get and once with get_many, for a range of producer/consumer
+counts. Run from the repository root with
+
+    python -m benchmarks.blocking_queue [num_items]
+"""
+import math
+import random
+import sys
+import threading
+import time
+
+from part2.chapter10 import BlockingPriorityQueue
+
+THREAD_COUNTS = [(1, 1), (4, 4), (8, 8), (1, 8), (8, 1)]
+MAXSIZE = 1000
+BATCH_SIZE = 32
+
+
+def _produce(priority_q, items):
+    for item in items:
+        priority_q.put(item)
+
+
+def _consume(priority_q, batch_size):
+    """Consumer thread. Takes items until it sees a sentinel (key inf), which all sort after
+    the real items, so every real item has been taken by then. Sentinels taken in the same
+    batch belong to other consumers and are handed back"""
+    while True:
+        if batch_size == 1:
+            items = [priority_q.get()]
+        else:
+            items = priority_q.get_many(batch_size)
+        sentinels = sum(1 for item in items if item == math.inf)
+        if sentinels:
+            for _ in range(sentinels - 1):
+                priority_q.put(math.inf)
+            return
+
+
+def run(num_producers, num_consumers, num_items, batch_size):
+    """Returns the number of items per second moved through the queue"""
+    priority_q = BlockingPriorityQueue(maxsize=MAXSIZE)
+    items = [random.randrange(1_000_000) for _ in range(num_items)]
+    shares = [items[i::num_producers] for i in range(num_producers)]
+
+    producers = [threading.Thread(target=_produce, args=(priority_q, share)) for share in shares]
+    consumers = [threading.Thread(target=_consume, args=(priority_q, batch_size))
+                 for _ in range(num_consumers)]
+
+    start = time.perf_counter()
+    for thread in producers + consumers:
+        thread.start()
+    for thread in producers:
+        thread.join()
+    for _ in range(num_consumers):
+        priority_q.put(math.inf)
+    for thread in consumers:
+        thread.join()
+    return num_items / (time.perf_counter() - start)
+
+
+def main(num_items=100_000):
+    print(f"{num_items} items, maxsize {MAXSIZE}, items per second")
+    print(f"{'producers':>9} {'consumers':>9} {'get':>10} {f'get_many({BATCH_SIZE})':>13}")
+    for num_producers, num_consumers in THREAD_COUNTS:
+        single = run(num_producers, num_consumers, num_items, 1)
+        batched = run(num_producers, num_consumers, num_items, BATCH_SIZE)
+        print(f"{num_producers:>9} {num_consumers:>9} {single:>10.0f} {batched:>13.0f}")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,68 @@
+"""Benchmark of the binary MinHeap in part2.chapter10 against the heap it replaced
+(benchmarks.original_heap) and heapq. Each run adds n random entries and then extracts all
+of them, 2n operations in total. Run from the repository root with
+
+    python -m benchmarks.heaps [n]
+"""
+import heapq
+import random
+import sys
+import time
+
+from benchmarks.original_heap import MinHeap as OriginalMinHeap
+from part2.chapter10 import MinHeap
+
+
+def _time_heap(heap, values):
+    start = time.perf_counter()
+    for value in values:
+        heap.add(value)
+    while not heap.is_empty():
+        heap.extract_min()
+    return time.perf_counter() - start
+
+
+def _time_heapq(values, key=None):
+    heap = []
+    start = time.perf_counter()
+    if key is None:
+        for value in values:
+            heapq.heappush(heap, value)
+    else:
+        # the usual heapq idiom for a key function, (key, value) pairs
+        for value in values:
+            heapq.heappush(heap, (key(value), value))
+    while heap:
+        heapq.heappop(heap)
+    return time.perf_counter() - start
+
+
+def run(n):
+    """Returns (name, seconds) for every heap, on the same n distinct random integers. The
+    key function runs order the entries by their value modulo 1000 (with ties)"""
+    values = random.sample(range(10 * n), n)
+    key = lambda x: x % 1000
+    return [
+        ("heapq", _time_heapq(values)),
+        ("heapq, (key, value) pairs", _time_heapq(values, key)),
+        ("original MinHeap", _time_heap(OriginalMinHeap(), values)),
+        ("original MinHeap, key", _time_heap(OriginalMinHeap(key=key), values)),
+        ("MinHeap", _time_heap(MinHeap(), values)),
+        ("MinHeap, track_positions", _time_heap(MinHeap(track_positions=True), values)),
+        ("MinHeap, key", _time_heap(MinHeap(key=key), values)),
+        ("MinHeap, key, track_positions",
+         _time_heap(MinHeap(key=key, track_positions=True), values)),
+    ]
+
+
+def main(n=500_000):
+    print(f"{n} adds followed by {n} extract_mins, speedups relative to the original MinHeap")
+    results = run(n)
+    baseline = dict(results)["original MinHeap"]
+    print(f"{'heap':<32} {'seconds':>8} {'speedup':>8}")
+    for name, seconds in results:
+        print(f"{name:<32} {seconds:>8.2f} {baseline / seconds:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
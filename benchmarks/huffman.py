@@ -0,0 +1,74 @@
+"""Throughput benchmark for the streaming Huffman compressor in part3.chapter14. A synthetic
+web server log is written to a temporary directory, compressed with huffman_compress_file,
+decompressed again with huffman_decompress_file and checked against the original. Run from
+the repository root with
+
+    python -m benchmarks.huffman [size in MB]
+"""
+import filecmp
+import os
+import random
+import sys
+import tempfile
+import time
+
+from part3.chapter14 import huffman_compress_file, huffman_decompress_file
+
+_PATHS = ["/", "/index.html", "/api/v1/users", "/api/v1/orders", "/static/app.js",
+          "/static/style.css", "/login", "/search?q=heap"]
+_STATUSES = [200] * 16 + [301, 304, 404, 500]
+_AGENTS = ["Mozilla/5.0 (X11; Linux x86_64)", "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
+           "curl/8.4.0", "python-requests/2.31.0"]
+
+
+def write_log(filename, size):
+    """Writes about size bytes of access log lines to filename"""
+    written = 0
+    with open(filename, "w") as file:
+        while written < size:
+            lines = []
+            for _ in range(10_000):
+                ip = ".".join(str(random.randrange(256)) for _ in range(4))
+                hour, minute = random.randrange(24), random.randrange(60)
+                lines.append(f'{ip} - - [18/Oct/2026:{hour:02}:{minute:02}:{minute:02} +0000] '
+                             f'"GET {random.choice(_PATHS)} HTTP/1.1" {random.choice(_STATUSES)} '
+                             f'{random.randrange(100_000)} "{random.choice(_AGENTS)}"\n')
+            block = "".join(lines)
+            file.write(block)
+            written += len(block)
+
+
+def run(size):
+    """Returns (compression MB/s, decompression MB/s, compressed size / original size) on a
+    log of about size bytes"""
+    with tempfile.TemporaryDirectory() as directory:
+        original = os.path.join(directory, "access.log")
+        compressed = os.path.join(directory, "access.log.huff")
+        decompressed = os.path.join(directory, "access.log.out")
+        write_log(original, size)
+        megabytes = os.path.getsize(original) / 1e6
+
+        start = time.perf_counter()
+        huffman_compress_file(original, compressed)
+        compress_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        huffman_decompress_file(compressed, decompressed)
+        decompress_seconds = time.perf_counter() - start
+
+        if not filecmp.cmp(original, decompressed, shallow=False):
+            raise AssertionError("Decompressed file differs from the original")
+        ratio = os.path.getsize(compressed) / os.path.getsize(original)
+    return megabytes / compress_seconds, megabytes / decompress_seconds, ratio
+
+
+def main(megabytes=20):
+    compress_speed, decompress_speed, ratio = run(megabytes * 1_000_000)
+    print(f"{megabytes} MB access log")
+    print(f"compress    {compress_speed:6.2f} MB/s")
+    print(f"decompress  {decompress_speed:6.2f} MB/s")
+    print(f"ratio       {ratio:6.3f}")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
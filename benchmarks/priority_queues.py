@@ -0,0 +1,77 @@
+"""Benchmark of the PriorityQueue backends in part2.chapter10 inside efficient_dijkstra and
+efficient_prim, on random graphs of increasing density. Each graph has n vertices joined in
+a ring (so every vertex is reachable) plus about n * degree random edges with weights
+between 1 and 1000. RadixHeap only takes part in Dijkstra, since the keys in Prim aren't
+monotone. Run from the repository root with
+
+    python -m benchmarks.priority_queues [n]
+"""
+import random
+import sys
+import time
+from functools import partial
+
+from part2.chapter9 import DirectedGraph
+from part2.chapter10 import MinHeap, DaryHeap, PairingHeap, RadixHeap
+from part3.chapter15 import MSTGraph
+
+DEGREES = [2, 8, 32, 128]
+QUEUE_FACTORIES = {
+    "MinHeap": partial(MinHeap, track_positions=True),
+    "DaryHeap": partial(DaryHeap, track_positions=True),
+    "PairingHeap": PairingHeap,
+    "RadixHeap": RadixHeap,
+}
+
+# each run is repeated this many times and the fastest time is kept
+REPEATS = 3
+
+
+def random_graph(graph, n, degree):
+    """Adds a ring of n vertices and n * degree random edges to an empty graph"""
+    for name in range(n):
+        graph.add_edge_by_name(name, (name + 1) % n, random.randint(1, 1000))
+    for _ in range(n * degree):
+        graph.add_edge_by_name(random.randrange(n), random.randrange(n), random.randint(1, 1000))
+    return graph
+
+
+def _time(function):
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(n, degree):
+    """Returns {(algorithm, backend): seconds} for one graph density"""
+    results = {}
+    digraph = random_graph(DirectedGraph(), n, degree)
+    for name, queue_factory in QUEUE_FACTORIES.items():
+        results["dijkstra", name] = _time(lambda: digraph.efficient_dijkstra(0, queue_factory))
+
+    mst_graph = random_graph(MSTGraph(), n, degree)
+    for name, queue_factory in QUEUE_FACTORIES.items():
+        if queue_factory is not RadixHeap:
+            results["prim", name] = _time(lambda: mst_graph.efficient_prim(queue_factory))
+    return results
+
+
+def main(n=5000):
+    print(f"{n} vertices, best of {REPEATS} runs in seconds")
+    print(f"{'algorithm':<9} {'degree':>6} " + " ".join(f"{name:>11}" for name in QUEUE_FACTORIES)
+          + "  winner")
+    for degree in DEGREES:
+        results = run(n, degree)
+        for algorithm in ("dijkstra", "prim"):
+            times = {name: results[algorithm, name] for name in QUEUE_FACTORIES
+                     if (algorithm, name) in results}
+            columns = " ".join(f"{times[name]:>11.3f}" if name in times else f"{'-':>11}"
+                               for name in QUEUE_FACTORIES)
+            print(f"{algorithm:<9} {degree:>6} {columns}  {min(times, key=times.get)}")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -1,3 +1,11 @@
+import copy
+import heapq
+import os
+import tempfile
+from array import array as typed_array
+from bisect import bisect_right
+
+
 def merge(left, right):
     i, j = 0, 0
     output = []
@@ -28,3 +36,275 @@ def mergesort(array):
     sorted_left = mergesort(array[:n//2])
     sorted_right = mergesort(array[n//2:])
     return merge(sorted_left, sorted_right)
+
+
+# number of output lines external_mergesort buffers before each write
+_WRITE_BUFFER_LINES = 65536
+
+# runs shorter than this are sorted by binary insertion before the merge passes start,
+# which saves the Python overhead of the first few (very short) merge passes
+_MIN_RUN = 32
+
+
+def _insertion_sort_run(array, keys, low, high):
+    """Helper function to bottom_up_mergesort. Sorts array[low:high] in place with binary
+    insertion sort. If keys is not None the entries are ordered by keys[low:high], and the
+    keys are moved along with their entries"""
+    for i in range(low + 1, high):
+        value = array[i]
+        if keys is None:
+            position = bisect_right(array, value, low, i)
+            if position < i:
+                # shift the larger entries one slot to the right with a single slice move
+                array[position + 1:i + 1] = array[position:i]
+                array[position] = value
+        else:
+            value_key = keys[i]
+            position = bisect_right(keys, value_key, low, i)
+            if position < i:
+                array[position + 1:i + 1] = array[position:i]
+                keys[position + 1:i + 1] = keys[position:i]
+                array[position] = value
+                keys[position] = value_key
+
+
+def _merge_runs(source, destination, low, mid, high):
+    """Helper function to bottom_up_mergesort. Merges the sorted runs source[low:mid] and
+    source[mid:high] into destination[low:high] without allocating any new lists"""
+    i, j, k = low, mid, low
+    left_value, right_value = source[i], source[j]
+    while True:
+        # take from the right run only when it is strictly smaller, which keeps the sort stable
+        if right_value < left_value:
+            destination[k] = right_value
+            k += 1
+            j += 1
+            # once one of the runs is exhausted the rest of the other run can be copied
+            # over in a single slice assignment
+            if j == high:
+                destination[k:high] = source[i:mid]
+                return
+            right_value = source[j]
+        else:
+            destination[k] = left_value
+            k += 1
+            i += 1
+            if i == mid:
+                destination[k:high] = source[j:high]
+                return
+            left_value = source[i]
+
+
+def _merge_keyed_runs(source, destination, source_keys, destination_keys, low, mid, high):
+    """Same as _merge_runs but compares the precomputed keys and moves each key along
+    with its entry"""
+    i, j, k = low, mid, low
+    left_key, right_key = source_keys[i], source_keys[j]
+    while True:
+        if right_key < left_key:
+            destination[k] = source[j]
+            destination_keys[k] = right_key
+            k += 1
+            j += 1
+            if j == high:
+                destination[k:high] = source[i:mid]
+                destination_keys[k:high] = source_keys[i:mid]
+                return
+            right_key = source_keys[j]
+        else:
+            destination[k] = source[i]
+            destination_keys[k] = left_key
+            k += 1
+            i += 1
+            if i == mid:
+                destination[k:high] = source[j:high]
+                destination_keys[k:high] = source_keys[j:high]
+                return
+            left_key = source_keys[i]
+
+
+def _reverse_in_place(array):
+    """Reverses any mutable sequence (list, array.array, NumPy array) by swapping entries"""
+    i, j = 0, len(array) - 1
+    while i < j:
+        array[i], array[j] = array[j], array[i]
+        i += 1
+        j -= 1
+
+
+def bottom_up_mergesort(array, key=None, reverse=False):
+    """Iterative mergesort that sorts array in place and returns it. Instead of slicing
+    the input at every level, short runs are sorted by insertion and then merged back and
+    forth between the array and a single scratch buffer of the same size, so peak memory
+    is about 2n (plus 2n for cached keys if a key function is given). Works on lists,
+    array.array and NumPy arrays. Stable, like sorted(). O(n log n) runtime"""
+    n = len(array)
+    if n <= 1:
+        return array
+
+    # a stable descending sort is the reverse of a stable ascending sort of the reversed
+    # input (this is also how list.sort handles reverse=True)
+    if reverse:
+        _reverse_in_place(array)
+
+    if key is None:
+        source_keys = None
+    else:
+        source_keys = [key(entry) for entry in array]
+
+    for low in range(0, n, _MIN_RUN):
+        _insertion_sort_run(array, source_keys, low, min(low + _MIN_RUN, n))
+
+    # copy.copy gives an independent buffer of the same type for all supported
+    # containers (array[:] would only be a view for NumPy arrays)
+    source, destination = array, copy.copy(array)
+    destination_keys = None if key is None else source_keys[:]
+
+    width = _MIN_RUN
+    while width < n:
+        for low in range(0, n, 2 * width):
+            mid = min(low + width, n)
+            high = min(low + 2 * width, n)
+
+            # a trailing run without a partner just gets copied across
+            if mid >= high:
+                destination[low:high] = source[low:high]
+                if key is not None:
+                    destination_keys[low:high] = source_keys[low:high]
+            elif key is None:
+                _merge_runs(source, destination, low, mid, high)
+            else:
+                _merge_keyed_runs(source, destination, source_keys, destination_keys,
+                                  low, mid, high)
+
+        # the buffer just written to holds the longer runs, so it becomes the source
+        # for the next pass
+        source, destination = destination, source
+        source_keys, destination_keys = destination_keys, source_keys
+        width *= 2
+
+    # after an odd number of passes the sorted output lives in the scratch buffer
+    if source is not array:
+        array[:] = source
+
+    if reverse:
+        _reverse_in_place(array)
+    return array
+
+
+def _write_run(values, directory, run_number):
+    """Helper function to external_mergesort. Writes a sorted run of 64-bit integers to a
+    temporary binary file and returns its path"""
+    filename = os.path.join(directory, f"run{run_number}.bin")
+    with open(filename, "wb") as file:
+        values.tofile(file)
+    return filename
+
+
+def _read_run(filename, block_size):
+    """Helper function to external_mergesort. Streams the integers of a binary run file,
+    reading block_size of them at a time"""
+    with open(filename, "rb") as file:
+        while True:
+            block = typed_array("q")
+            try:
+                block.fromfile(file, block_size)
+            except EOFError:
+                # fromfile still keeps whatever was left at the end of the file
+                yield from block
+                return
+            yield from block
+
+
+def _sorted_runs(input_filename, run_size, directory):
+    """Helper function to external_mergesort. Reads the one-int-per-line input file
+    run_size integers at a time, sorts each run in memory and writes it to disk"""
+    filenames = []
+    run = typed_array("q")
+    with open(input_filename, "r") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            run.append(int(line))
+            if len(run) >= run_size:
+                filenames.append(_write_run(bottom_up_mergesort(run), directory, len(filenames)))
+                run = typed_array("q")
+    if len(run) > 0:
+        filenames.append(_write_run(bottom_up_mergesort(run), directory, len(filenames)))
+    return filenames
+
+
+def _merge_run_files(filenames, output_filename, block_size):
+    """Helper function to external_mergesort. Heap based k-way merge of sorted run files
+    into a single sorted run file"""
+    streams = [_read_run(filename, block_size) for filename in filenames]
+    buffer = typed_array("q")
+    with open(output_filename, "wb") as file:
+        for value in heapq.merge(*streams):
+            buffer.append(value)
+            if len(buffer) >= block_size:
+                buffer.tofile(file)
+                buffer = typed_array("q")
+        buffer.tofile(file)
+
+    for filename in filenames:
+        os.remove(filename)
+    return output_filename
+
+
+def _external_sorted(input_filename, run_size, fan_in, temp_dir):
+    """Generator behind external_mergesort. Temporary files are removed once the
+    generator is exhausted or closed"""
+    with tempfile.TemporaryDirectory(dir=temp_dir) as directory:
+        filenames = _sorted_runs(input_filename, run_size, directory)
+
+        # each open run gets an equal share of the memory budget as its read buffer
+        block_size = max(1, run_size // (fan_in + 1))
+
+        # merge fan_in runs at a time until the remaining runs can all be merged at once
+        pass_number = 0
+        while len(filenames) > fan_in:
+            merged = []
+            for i in range(0, len(filenames), fan_in):
+                group = filenames[i:i + fan_in]
+                output_filename = os.path.join(directory, f"pass{pass_number}_{i}.bin")
+                merged.append(_merge_run_files(group, output_filename, block_size))
+            filenames = merged
+            pass_number += 1
+
+        streams = [_read_run(filename, block_size) for filename in filenames]
+        yield from heapq.merge(*streams)
+
+
+def external_mergesort(input_filename, output_filename=None, run_size=1_000_000, fan_in=16,
+                       temp_dir=None):
+    """External memory mergesort for files of integers (one per line) that don't fit in
+    memory. The input is cut into runs of run_size integers that are sorted in memory
+    with bottom_up_mergesort and written to temporary binary files, which are then
+    combined with a heap based k-way merge of at most fan_in runs at a time. At most about
+    2 * run_size integers are held in memory. Integers must fit in 64 bits.
+
+    If output_filename is given the sorted integers are written to it in the same
+    one-int-per-line format and the number of integers is returned, otherwise an
+    iterator over the sorted integers is returned. O(n log n) runtime"""
+    if run_size < 1:
+        raise ValueError("run_size must be at least 1")
+    if fan_in < 2:
+        raise ValueError("fan_in must be at least 2")
+
+    sorted_values = _external_sorted(input_filename, run_size, fan_in, temp_dir)
+    if output_filename is None:
+        return sorted_values
+
+    count = 0
+    lines = []
+    with open(output_filename, "w") as file:
+        for value in sorted_values:
+            lines.append(f"{value}\n")
+            if len(lines) >= _WRITE_BUFFER_LINES:
+                file.writelines(lines)
+                count += len(lines)
+                lines = []
+        file.writelines(lines)
+        count += len(lines)
+    return count
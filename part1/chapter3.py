@@ -1,5 +1,15 @@
+import heapq
+import math
+import random
+from bisect import insort
+from collections import Counter, defaultdict
 from itertools import combinations
 
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed for the vectorized engines
+    np = None
+
 
 def _count_split_inv(left, right):
     """Helper function to count_inv. Based on merge subroutine of mergesort and counts all instances
@@ -57,6 +67,97 @@ def count_inv(array):
     return _count_inv(array)[1]
 
 
+def _compressed_ranks(array):
+    """Helper function for fenwick_count_inv. Replaces each entry by its rank (1 indexed)
+    among the distinct values of the array, so equal entries get equal ranks"""
+    ranks = {value: rank for rank, value in enumerate(sorted(set(array)), start=1)}
+    return [ranks[value] for value in array]
+
+
+def fenwick_count_inv(array):
+    """Counts inversions with a Fenwick (binary indexed) tree over the compressed ranks of
+    the entries. Scanning from right to left, the tree counts how many of the entries seen
+    so far have each rank, so the number of smaller entries to the right of the current one
+    is a prefix sum. O(n log n) runtime, with no slicing or intermediate lists"""
+    ranks = _compressed_ranks(array)
+    m = len(ranks) and max(ranks)
+    tree = [0] * (m + 1)
+
+    inversions = 0
+    for rank in reversed(ranks):
+        # prefix sum over ranks strictly smaller than the current one
+        i = rank - 1
+        while i > 0:
+            inversions += tree[i]
+            i -= i & -i
+
+        # record the current rank
+        i = rank
+        while i <= m:
+            tree[i] += 1
+            i += i & -i
+    return inversions
+
+
+def numpy_count_inv(array):
+    """Vectorized inversion count for large arrays. Entries are replaced by their ranks,
+    and the ranks are processed one bit at a time from the most significant bit down, like
+    a radix sort. At each bit the array is grouped by the higher bits (a stable partition
+    of the previous level), and any pair in the same group whose bits differ is an
+    inversion exactly when the 1 comes before the 0. Each level is a handful of O(n) NumPy
+    operations. Requires NumPy. O(n log n) runtime"""
+    if np is None:
+        raise ImportError("numpy_count_inv requires numpy")
+
+    _, ranks = np.unique(np.asarray(array), return_inverse=True)
+    n = ranks.size
+    if n <= 1:
+        return 0
+
+    # 32 bit positions halve the memory traffic of every pass whenever they fit
+    dtype = np.int32 if n < 2 ** 31 else np.int64
+    sequence = ranks.astype(dtype).ravel()
+    index = np.arange(n, dtype=dtype)
+    num_bits = max(1, int(sequence.max()).bit_length())
+
+    inversions = 0
+    for b in range(num_bits - 1, -1, -1):
+        is_zero = ((sequence >> b) & 1) == 0
+
+        # the sequence is stably sorted by the higher bits, so every group of equal
+        # higher bits is a contiguous block
+        group = sequence >> (b + 1)
+        is_start = np.empty(n, dtype=bool)
+        is_start[0] = True
+        np.not_equal(group[1:], group[:-1], out=is_start[1:])
+        starts = np.flatnonzero(is_start)
+        sizes = np.diff(np.append(starts, n))
+        group_start = np.repeat(starts.astype(dtype), sizes)
+        offset_in_group = index - group_start
+
+        # number of 0 bits before each entry within its own group
+        zeros_before = np.cumsum(is_zero, dtype=dtype) - is_zero
+        zeros_before_in_group = zeros_before - zeros_before[group_start]
+        group_zeros = np.add.reduceat(is_zero, starts, dtype=np.int64)
+
+        # every (1 then 0) pair in a group is an inversion decided at this bit. The number
+        # of 1s before a 0 is its offset in the group minus the 0s before it. Summed over
+        # the 0s of a group, the offsets are their indices minus z * start, and the 0s
+        # before them add up to z * (z - 1) / 2
+        inversions += int(np.flatnonzero(is_zero).sum(dtype=np.int64))
+        inversions -= int((group_zeros * starts + group_zeros * (group_zeros - 1) // 2).sum())
+
+        # stable partition of each group by the current bit: zeros first, then ones
+        zeros_in_group = np.repeat(group_zeros.astype(dtype), sizes)
+        new_positions = group_start + np.where(
+            is_zero, zeros_before_in_group,
+            zeros_in_group + offset_in_group - zeros_before_in_group)
+        partitioned = np.empty_like(sequence)
+        partitioned[new_positions] = sequence
+        sequence = partitioned
+    return inversions
+
+
 def _distance(point_pair):
     if point_pair is None:
         return float('inf')
@@ -74,7 +175,9 @@ def _closest_split_pair(x_sorted, y_sorted, delta):
     x_bar = x_sorted[mid][0]  # largest x coord in left half
     # we only look at a subset of the points, those within delta of the midline, where delta
     # is the closest distance that has already been found in the left or right halves
-    y_restricted = [point for point in y_sorted if x_bar - delta < point[0] < x_bar + delta]
+    # (delta is a squared distance, so the strip is sqrt(delta) wide on each side)
+    width = math.sqrt(delta)
+    y_restricted = [point for point in y_sorted if x_bar - width < point[0] < x_bar + width]
 
     # determine the closest pair within this subset, or return None if there is no pair
     # that has a distance less than delta
@@ -98,9 +201,19 @@ def _execute_closest_pair(x_sorted, y_sorted):
 
     mid = n // 2
     lx = x_sorted[:mid]
-    ly = y_sorted[:mid]
     rx = x_sorted[mid:]
-    ry = y_sorted[mid:]
+
+    # split the y sorted points by which half of x_sorted they belong to, keeping them
+    # sorted by y. Counting handles repeated points
+    left_counts = Counter(lx)
+    ly = []
+    ry = []
+    for point in y_sorted:
+        if left_counts[point] > 0:
+            left_counts[point] -= 1
+            ly.append(point)
+        else:
+            ry.append(point)
 
     # find the closest pair in the left half of the points, and the closest pair in the right half
     # each of these is a list of two points (tuples), ex. [(1,2),(3,4)]
@@ -122,38 +235,169 @@ def closest_pair(points):
     return _execute_closest_pair(x_sorted, y_sorted)
 
 
-def unimodal_max(array):
-    """Problem 3.3. Returns max element of uni-modal array. Takes O(log n) runtime"""
-    mid = len(array) // 2
-    check1 = mid - 1
-    check2 = mid
-    check3 = mid + 1
-    if len(array) <= 2:
-        return max(array)
+def _build_grid(points, indices, side):
+    """Helper function for grid_closest_pair. Buckets the given points into square cells
+    with the given side length"""
+    grid = defaultdict(list)
+    for i in indices:
+        x, y = points[i]
+        grid[(x // side, y // side)].append(i)
+    return grid
+
+
+def _add_coincident(indices, index, limit):
+    """Helper function for grid_closest_pair. Adds index to the sorted list of indices of
+    the points at one location, keeping only the smallest limit of them, since a new point
+    makes its best pairs with the lowest indices"""
+    insort(indices, index)
+    del indices[limit:]
+
+
+def _build_coincident(points, indices, limit):
+    """Helper function for grid_closest_pair. Maps each location to the (at most limit)
+    smallest indices of the given points there"""
+    coincident = defaultdict(list)
+    for i in indices:
+        _add_coincident(coincident[points[i]], i, limit)
+    return coincident
+
+
+def grid_closest_pair(points, k=None):
+    """Randomized closest pair (Rabin / Golin et al.). Points are inserted in random order
+    into a grid whose cells are at least as wide as the closest distance found so far, so
+    each new point only has to be compared to the points in the 3x3 block of cells around
+    it. The grid is rebuilt when the closest distance shrinks to half the cell width, and
+    the closest distance only shrinks at the t-th point with probability 2/t, giving an
+    expected O(n) runtime.
+
+    points can be a list of 2D tuples or an (n, 2) NumPy array. Returns the same pair as
+    inefficient_closest: pairs are ranked by distance and then by their indices, in input
+    order. If k is given, returns a list of the k best pairs in that order instead"""
+    if np is not None and isinstance(points, np.ndarray):
+        points = [tuple(point) for point in points.tolist()]
+
+    n = len(points)
+    num_pairs = min(1 if k is None else k, n * (n - 1) // 2)
+    if num_pairs <= 0:
+        return None if k is None else []
+
+    order = list(range(n))
+    random.shuffle(order)
+
+    # brute force the first few points until there are num_pairs candidate pairs. The
+    # candidates are kept in a max heap (by negated distance) of size num_pairs, so the
+    # root holds delta, the largest distance that is still good enough
+    m = 2
+    while m * (m - 1) // 2 < num_pairs:
+        m += 1
+    best = []
+    for a in range(m):
+        for b in range(a):
+            i, j = sorted((order[a], order[b]))
+            heapq.heappush(best, (-dist(points[i], points[j]), -i, -j))
+    while len(best) > num_pairs:
+        heapq.heappop(best)
+
+    delta = -best[0][0]
+    side = math.sqrt(delta)
+    grid = _build_grid(points, order[:m], side) if delta > 0 else None
+    coincident = _build_coincident(points, order[:m], num_pairs) if delta == 0 else None
+
+    for t in range(m, n):
+        new_index = order[t]
+
+        # once delta is 0 only coincident points can still make a better pair, so the grid
+        # is replaced by a map from coordinates to the points there
+        if coincident is not None:
+            others = coincident[points[new_index]]
+            for other_index in others:
+                i, j = sorted((new_index, other_index))
+                candidate = (-dist(points[i], points[j]), -i, -j)
+                if candidate > best[0]:
+                    heapq.heappushpop(best, candidate)
+            _add_coincident(others, new_index, num_pairs)
+            continue
 
-    if array[check1] < array[check2] > array[check3]:
-        return array[check2]
-    elif array[check1] < array[check2] < array[check3]:
-        return unimodal_max(array[check2:])
-    elif array[check1] > array[check2] > array[check3]:
-        return unimodal_max(array[:check2])
+        x, y = points[new_index]
+        cell_x, cell_y = x // side, y // side
+
+        # any point within delta is at most one cell away in each direction. Pairs are
+        # ranked by (distance, i, j), so ties go to the pair inefficient_closest finds first
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for other_index in grid.get((cell_x + dx, cell_y + dy), ()):
+                    distance = dist(points[new_index], points[other_index])
+                    if distance <= -best[0][0]:
+                        i, j = sorted((new_index, other_index))
+                        if (-distance, -i, -j) > best[0]:
+                            heapq.heappushpop(best, (-distance, -i, -j))
+
+        grid[(cell_x, cell_y)].append(new_index)
+        delta = -best[0][0]
+
+        if delta == 0:
+            grid = None
+            coincident = _build_coincident(points, order[:t + 1], num_pairs)
+        # cells wider than sqrt(delta) still catch every close enough pair, so the grid is
+        # only rebuilt once the cells are twice as wide as needed
+        elif 2 * math.sqrt(delta) <= side:
+            side = math.sqrt(delta)
+            grid = _build_grid(points, order[:t + 1], side)
+
+    pairs = sorted((-distance, -i, -j) for distance, i, j in best)
+    if k is None:
+        _, i, j = pairs[0]
+        return points[i], points[j]
+    return [(points[i], points[j]) for _, i, j in pairs]
+
+
+def unimodal_max(array, lo=0, hi=None):
+    """Problem 3.3. Returns max element of uni-modal array. Only looks at array[lo:hi], which
+    is searched by index rather than by slicing, so array can be any indexable sequence
+    (list, array.array, memoryview, NumPy array). Takes O(log n) runtime and O(1) space"""
+    if hi is None:
+        hi = len(array)
+
+    # the max is at the first index whose right neighbour is smaller, so keep it inside
+    # [lo, hi) while halving the range
+    while hi - lo > 1:
+        mid = (lo + hi - 1) // 2
+        if array[mid] < array[mid + 1]:
+            lo = mid + 1
+        else:
+            hi = mid + 1
+    return array[lo]
 
 
-def equal_index(array, offset=0):
+def equal_index(array, offset=0, lo=0, hi=None):
     """Algorithms Illuminated problem 3.4. Returns True/ False if sorted integer array has an element
-    that is equal to its search_index. O(log n) runtime"""
-    if len(array) == 0:
-        return False
+    that is equal to its search_index (plus offset) within array[lo:hi]. Searches by index
+    rather than by slicing, so array can be any indexable sequence. O(log n) runtime and
+    O(1) space"""
+    if hi is None:
+        hi = len(array)
+
+    while lo < hi:
+        index_to_check = (lo + hi) // 2
+        if array[index_to_check] == index_to_check + offset:
+            return True
+        elif array[index_to_check] < index_to_check + offset:
+            lo = index_to_check + 1
+        else:
+            hi = index_to_check
+    return False
 
-    index_to_check = len(array) // 2
 
-    if array[index_to_check] == index_to_check + offset:
-        return True
-    elif array[index_to_check] < index_to_check + offset:
-        offset += index_to_check + 1
-        return equal_index(array[index_to_check + 1:], offset)
-    else:
-        return equal_index(array[:index_to_check], offset)
+def batch_unimodal_max(array, ranges):
+    """Runs unimodal_max on every (lo, hi) range of one shared array, for example an
+    array.array or NumPy buffer, without copying it. O(log n) runtime per query"""
+    return [unimodal_max(array, lo, hi) for lo, hi in ranges]
+
+
+def batch_equal_index(array, ranges, offset=0):
+    """Runs equal_index on every (lo, hi) range of one shared sorted array without
+    copying it. O(log n) runtime per query"""
+    return [equal_index(array, offset, lo, hi) for lo, hi in ranges]
 
 
 def inefficient_closest(points):
@@ -167,3 +411,207 @@ def inefficient_closest(points):
                 closest_distance = dist(points[i], points[j])
                 closest = (points[i], points[j])
     return closest
+
+
+class KDNode:
+
+    def __init__(self, point, axis):
+        self.point = point
+        # coordinate (0 for x, 1 for y) that splits the subtree rooted at this node
+        self.axis = axis
+        self.left_child = None
+        self.right_child = None
+
+        # deleted nodes stay in the tree to guide searches until the next rebuild
+        self.deleted = False
+
+    def __str__(self):
+        return str(self.point)
+
+
+class KDTree:
+    """2D tree over points (2D tuples) using the same squared distance as dist, for
+    repeated nearest neighbour queries on a point set that changes slowly. Queries take
+    O(log n) expected time instead of the O(n log n) of recomputing from scratch"""
+
+    def __init__(self, points=None):
+        self.root = None
+        self.len = 0
+        self.num_deleted = 0
+        # number of inserts since the last bulk build, used to decide when to rebalance
+        self.num_inserted = 0
+
+        if points is not None:
+            self.build(points)
+
+    def __len__(self):
+        return self.len
+
+    def build(self, points):
+        """Bulk builds a balanced tree from a list of points or an (n, 2) NumPy array,
+        replacing the current contents. O(n log^2 n) runtime"""
+        if np is not None and isinstance(points, np.ndarray):
+            points = [tuple(point) for point in points.tolist()]
+        self.root = self._build(list(points), 0)
+        self.len = len(points)
+        self.num_deleted = 0
+        self.num_inserted = 0
+
+    def _build(self, points, depth):
+        if len(points) == 0:
+            return None
+
+        # split at the median along alternating axes
+        axis = depth % 2
+        points.sort(key=lambda point: point[axis])
+        mid = len(points) // 2
+
+        node = KDNode(points[mid], axis)
+        node.left_child = self._build(points[:mid], depth + 1)
+        node.right_child = self._build(points[mid + 1:], depth + 1)
+        return node
+
+    def all_points(self):
+        """Returns a list of all points in the tree"""
+        output = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            if not node.deleted:
+                output.append(node.point)
+            for child in (node.left_child, node.right_child):
+                if child is not None:
+                    stack.append(child)
+        return output
+
+    def insert(self, point):
+        """Inserts a point, rebuilding the tree once as many points have been inserted as it
+        was built with, to keep it balanced. O(log n) amortized runtime for random inserts"""
+        point = tuple(point)
+        self.len += 1
+        self.num_inserted += 1
+
+        if self.root is None:
+            self.root = KDNode(point, 0)
+        else:
+            current_node = self.root
+            while True:
+                if point[current_node.axis] < current_node.point[current_node.axis]:
+                    if current_node.left_child is None:
+                        current_node.left_child = KDNode(point, 1 - current_node.axis)
+                        break
+                    current_node = current_node.left_child
+                else:
+                    if current_node.right_child is None:
+                        current_node.right_child = KDNode(point, 1 - current_node.axis)
+                        break
+                    current_node = current_node.right_child
+
+        if self.num_inserted > self.len - self.num_inserted:
+            self.build(self.all_points())
+
+    def delete(self, point):
+        """Deletes one copy of a point from the tree. The node is only marked as deleted, and
+        the tree is rebuilt once half of its nodes are deleted. O(log n) amortized runtime"""
+        point = tuple(point)
+        node = self._find(point)
+        if node is None:
+            raise AttributeError("Point not in tree")
+
+        node.deleted = True
+        self.len -= 1
+        self.num_deleted += 1
+        if self.num_deleted > self.len:
+            self.build(self.all_points())
+
+    def _find(self, point):
+        """Returns a node holding point that hasn't been deleted, or None"""
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            if not node.deleted and node.point == point:
+                return node
+
+            # ties on the splitting coordinate can end up on either side after a bulk build
+            difference = point[node.axis] - node.point[node.axis]
+            if difference <= 0 and node.left_child is not None:
+                stack.append(node.left_child)
+            if difference >= 0 and node.right_child is not None:
+                stack.append(node.right_child)
+        return None
+
+    def k_nearest(self, point, k):
+        """Returns the (up to) k points closest to point, sorted by distance. O(log n + k)
+        expected runtime"""
+        if k <= 0:
+            return []
+
+        # max heap (by negated distance) of the k best points so far, the counter breaks
+        # ties so points themselves are never compared
+        best = []
+        counter = 0
+
+        # each stack entry holds a subtree and the squared distance from point to the
+        # splitting line that separates it from point (0 if on the same side)
+        stack = [(self.root, 0)]
+        while stack:
+            node, line_distance = stack.pop()
+            if node is None:
+                continue
+
+            # skip the subtree if the splitting line is farther than the kth best point
+            if len(best) == k and line_distance >= -best[0][0]:
+                continue
+
+            if not node.deleted:
+                distance = dist(point, node.point)
+                if len(best) < k:
+                    heapq.heappush(best, (-distance, counter, node.point))
+                elif distance < -best[0][0]:
+                    heapq.heappushpop(best, (-distance, counter, node.point))
+                counter += 1
+
+            # search the side of the splitting line containing point first, and only
+            # search the other side if the line is closer than the kth best point
+            difference = point[node.axis] - node.point[node.axis]
+            if difference < 0:
+                near_child, far_child = node.left_child, node.right_child
+            else:
+                near_child, far_child = node.right_child, node.left_child
+            stack.append((far_child, difference ** 2))
+            stack.append((near_child, 0))
+
+        return [entry[2] for entry in sorted(best, key=lambda entry: (-entry[0], entry[1]))]
+
+    def nearest(self, point):
+        """Returns the point in the tree closest to point. O(log n) expected runtime"""
+        closest = self.k_nearest(point, 1)
+        return closest[0] if closest else None
+
+    def radius_query(self, point, radius):
+        """Returns all points within distance radius of point, i.e. with
+        dist(point, other) <= radius ** 2. O(log n + number of points found) expected runtime"""
+        radius_squared = radius ** 2
+        output = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            if not node.deleted and dist(point, node.point) <= radius_squared:
+                output.append(node.point)
+
+            # only cross the splitting line if it is within the radius
+            difference = point[node.axis] - node.point[node.axis]
+            if node.left_child is not None and (difference < 0 or difference ** 2 <= radius_squared):
+                stack.append(node.left_child)
+            if node.right_child is not None and (difference >= 0 or difference ** 2 <= radius_squared):
+                stack.append(node.right_child)
+        return output
+
+    def batch_k_nearest(self, points, k=1):
+        """Runs k_nearest for every query point in a list or an (n, 2) NumPy array and returns
+        a list of the results. With k=1 each result is a single point rather than a list"""
+        if np is not None and isinstance(points, np.ndarray):
+            points = points.tolist()
+        if k == 1:
+            return [self.nearest(point) for point in points]
+        return [self.k_nearest(point, k) for point in points]
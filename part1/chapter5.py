@@ -1,4 +1,12 @@
+import os
 import random
+from array import array as typed_array
+from bisect import bisect_left, bisect_right
+from itertools import cycle
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+
+from part1.chapter1 import bottom_up_mergesort
 
 
 def _partition(array, left, right):
@@ -33,28 +41,327 @@ def median_pivot(array, left, right):
     return sorted(indices_and_values, key=lambda x: x[1])[1][0]
 
 
-def _quicksort(array, left, right, choose_pivot):
+def single_pivot_partition(array, left, right, choose_pivot):
+    """Default partition scheme for quicksort: moves the chosen pivot to the front and
+    partitions around it with _partition. Returns the ranges left to sort"""
+    i = choose_pivot(array, left, right)
+    array[left], array[i] = array[i], array[left]
 
-    if left >= right:
-        return 0, array
+    j = _partition(array, left, right)
+    return [(left, j - 1), (j + 1, right)]
+
+
+def three_way_partition(array, left, right, choose_pivot):
+    """Dutch national flag partition. Splits the range into entries smaller than, equal to
+    and larger than the pivot, and only the outer two are left to sort, so arrays with
+    many duplicate keys take linear rather than quadratic time"""
+    i = choose_pivot(array, left, right)
+    array[left], array[i] = array[i], array[left]
+    pivot = array[left]
+
+    # invariant: array[left:lt] < pivot, array[lt:i] == pivot, array[gt + 1:right + 1] > pivot
+    lt, i, gt = left, left + 1, right
+    while i <= gt:
+        if array[i] < pivot:
+            array[lt], array[i] = array[i], array[lt]
+            lt += 1
+            i += 1
+        elif array[i] > pivot:
+            array[i], array[gt] = array[gt], array[i]
+            gt -= 1
+        else:
+            i += 1
+    return [(left, lt - 1), (gt + 1, right)]
 
+
+def dual_pivot_partition(array, left, right, choose_pivot):
+    """Yaroslavskiy's dual pivot partition. Two pivots p <= q are chosen (moved to the
+    ends of the range) and the range is split into entries < p, between p and q, and > q.
+    If p == q the middle part is all duplicates and doesn't need sorting"""
     i = choose_pivot(array, left, right)
     array[left], array[i] = array[i], array[left]
+    j = choose_pivot(array, left + 1, right) if left + 1 < right else right
+    array[right], array[j] = array[j], array[right]
+    if array[left] > array[right]:
+        array[left], array[right] = array[right], array[left]
+    p, q = array[left], array[right]
 
-    j = _partition(array, left, right)
+    # invariant: array[left + 1:lt] < p, array[lt:i] between p and q, array[gt + 1:right] > q
+    lt, i, gt = left + 1, left + 1, right - 1
+    while i <= gt:
+        if array[i] < p:
+            array[i], array[lt] = array[lt], array[i]
+            lt += 1
+        elif array[i] > q:
+            while array[gt] > q and i < gt:
+                gt -= 1
+            array[i], array[gt] = array[gt], array[i]
+            gt -= 1
+            if array[i] < p:
+                array[i], array[lt] = array[lt], array[i]
+                lt += 1
+        i += 1
+
+    # move the pivots into their final positions
+    lt -= 1
+    gt += 1
+    array[left], array[lt] = array[lt], array[left]
+    array[right], array[gt] = array[gt], array[right]
+
+    if p == q:
+        return [(left, lt - 1), (gt + 1, right)]
+    return [(left, lt - 1), (lt + 1, gt - 1), (gt + 1, right)]
+
+
+def _quicksort(array, left, right, choose_pivot, partition=single_pivot_partition):
+
+    if left >= right:
+        return 0, array
+
+    # every partition scheme is charged m - 1 steps for a range of length m, so the
+    # strategies can be compared with num_steps
     num_steps = right - left
-    num_steps += _quicksort(array, left, j - 1, choose_pivot)[0]
-    num_steps += _quicksort(array, j + 1, right, choose_pivot)[0]
+    for sub_left, sub_right in partition(array, left, right, choose_pivot):
+        num_steps += _quicksort(array, sub_left, sub_right, choose_pivot, partition)[0]
 
     return num_steps, array
 
 
-def quicksort(array, pivot_choice=random_pivot, num_steps=False):
+def quicksort(array, pivot_choice=random_pivot, num_steps=False, partition=single_pivot_partition):
     l = 0
     r = len(array)
     if num_steps:
-        return _quicksort(array, l, r - 1, pivot_choice)[0]
+        return _quicksort(array, l, r - 1, pivot_choice, partition)[0]
     else:
-        return _quicksort(array, l, r - 1, pivot_choice)[1]
+        return _quicksort(array, l, r - 1, pivot_choice, partition)[1]
+
+
+# ranges at most this long are finished off with insertion sort by introsort
+_INSERTION_SORT_SIZE = 16
+
+
+def _insertion_sort_range(array, left, right):
+    """Helper function to introsort. Sorts array[left:right + 1] in place"""
+    for i in range(left + 1, right + 1):
+        value = array[i]
+        j = i - 1
+        while j >= left and value < array[j]:
+            array[j + 1] = array[j]
+            j -= 1
+        array[j + 1] = value
+
+
+def _sift_down(array, left, root, end):
+    """Helper function to _heapsort_range. Restores the max heap property for the heap
+    stored in array[left:end], where node k has children 2k + 1 and 2k + 2 (relative to left)"""
+    while True:
+        child = 2 * root + 1
+        if left + child >= end:
+            return
+        if left + child + 1 < end and array[left + child] < array[left + child + 1]:
+            child += 1
+        if not array[left + root] < array[left + child]:
+            return
+        array[left + root], array[left + child] = array[left + child], array[left + root]
+        root = child
+
+
+def _heapsort_range(array, left, right):
+    """Helper function to introsort. Sorts array[left:right + 1] in place with heapsort,
+    which is O(n log n) no matter how the input is arranged"""
+    n = right - left + 1
+    for root in range(n // 2 - 1, -1, -1):
+        _sift_down(array, left, root, left + n)
+    for end in range(n - 1, 0, -1):
+        array[left], array[left + end] = array[left + end], array[left]
+        _sift_down(array, left, 0, left + end)
+
+
+def introsort(array, pivot_choice=random_pivot, partition=single_pivot_partition):
+    """Recursion free quicksort. Ranges still to be sorted are kept on an explicit stack,
+    with the smaller ranges on top so the stack never holds more than O(log n) of them.
+    Ranges that get more than 2 log2(n) partitions deep are heapsorted instead, and short
+    ranges are insertion sorted. O(n log n) worst case runtime for any pivot_choice and
+    partition scheme, and the array is sorted in place and returned"""
+    n = len(array)
+    depth_limit = 2 * max(1, n.bit_length())
+
+    stack = [(0, n - 1, 0)]
+    while stack:
+        left, right, depth = stack.pop()
+
+        if right - left + 1 <= _INSERTION_SORT_SIZE:
+            _insertion_sort_range(array, left, right)
+        elif depth > depth_limit:
+            _heapsort_range(array, left, right)
+        else:
+            # push the larger ranges first, so the smallest range is processed next
+            ranges = partition(array, left, right, pivot_choice)
+            ranges.sort(key=lambda r: r[1] - r[0], reverse=True)
+            for sub_left, sub_right in ranges:
+                if sub_left < sub_right:
+                    stack.append((sub_left, sub_right, depth + 1))
+
+    return array
+
+
+def _attach(name, n):
+    """Helper function to parallel_sort. Attaches to a shared block of n 64-bit integers
+    and returns the block along with an integer view of it"""
+    block = SharedMemory(name=name)
+    return block, block.buf.cast("q")[:n]
+
+
+def _detach(block, view):
+    # the view has to be released before the block can be closed
+    view.release()
+    block.close()
+
+
+# parallel_sort picks its splitters from a random sample this many times larger than
+# the number of buckets, which keeps the buckets close to n / processes long
+_SAMPLES_PER_BUCKET = 32
+
+
+def _spread_duplicates(splitters):
+    """Helper function to _bucket_chunk. A value that appears as several splitters owns all
+    the buckets from its first to its last occurrence (the buckets in between can only hold
+    that value), so entries equal to it can go to any of them. Returns a dictionary from
+    each such value to a cycle over its buckets, which spreads those entries evenly"""
+    spread = {}
+    for value in set(splitters):
+        low, high = bisect_left(splitters, value), bisect_right(splitters, value)
+        if high - low > 1:
+            spread[value] = cycle(range(low, high + 1))
+    return spread
+
+
+def _bucket_chunk(source_name, scratch_name, n, low, high, splitters):
+    """Worker task for parallel_sort. Splits source[low:high] into buckets by value, bucket
+    b holding the entries between splitters[b - 1] and splitters[b], and writes the buckets
+    one after another to scratch[low:high]. Returns the size of each bucket"""
+    source_block, source = _attach(source_name, n)
+    try:
+        values = typed_array("q")
+        values.frombytes(source[low:high].cast("B"))
+    finally:
+        _detach(source_block, source)
+
+    if splitters:
+        buckets = [typed_array("q") for _ in range(len(splitters) + 1)]
+        appends = [bucket.append for bucket in buckets]
+        spread = _spread_duplicates(splitters)
+        if spread:
+            for value in values:
+                if value in spread:
+                    appends[next(spread[value])](value)
+                else:
+                    appends[bisect_right(splitters, value)](value)
+        else:
+            for value in values:
+                appends[bisect_right(splitters, value)](value)
+        values = typed_array("q")
+        for bucket in buckets:
+            values.extend(bucket)
+        sizes = [len(bucket) for bucket in buckets]
+    else:
+        sizes = [len(values)]
+
+    scratch_block, scratch = _attach(scratch_name, n)
+    try:
+        scratch[low:high] = values
+    finally:
+        _detach(scratch_block, scratch)
+    return sizes
+
+
+def _sort_bucket(scratch_name, destination_name, n, segments, offset, algorithm, pivot_choice):
+    """Worker task for parallel_sort. Gathers the pieces of one bucket from scratch (one
+    (start, end) segment per chunk), sorts them with introsort (using pivot_choice, and
+    falling back to heapsort on duplicate-heavy or presorted buckets) or bottom_up_mergesort,
+    and writes the result to its own slice of destination starting at offset"""
+    scratch_block, scratch = _attach(scratch_name, n)
+    try:
+        values = typed_array("q")
+        for start, end in segments:
+            values.frombytes(scratch[start:end].cast("B"))
+    finally:
+        _detach(scratch_block, scratch)
+
+    # the sorts index a list about twice as fast as an array of 64-bit integers
+    values = values.tolist()
+    if algorithm == "quicksort":
+        introsort(values, pivot_choice)
+    else:
+        bottom_up_mergesort(values)
+
+    destination_block, destination = _attach(destination_name, n)
+    try:
+        destination[offset:offset + len(values)] = typed_array("q", values)
+    finally:
+        _detach(destination_block, destination)
+
+
+def parallel_sort(array, algorithm="quicksort", pivot_choice=random_pivot, processes=None):
+    """Sorts a list of 64-bit integers in place using a pool of worker processes (sample
+    sort) and returns it. processes - 1 splitters are picked from a random sample, cutting
+    the values into one range per process. The array is copied once into a shared memory
+    block; each worker splits one chunk of it into the ranges, then each worker gathers one
+    range and sorts it with introsort (using pivot_choice) or bottom_up_mergesort straight
+    into its own slice of the output, so nothing has to be merged afterwards. Entries equal
+    to a value that was picked as several splitters are spread over all the ranges that
+    value owns, so duplicate-heavy input still keeps every process busy. Only block
+    names, indices and splitters are ever pickled. O(n log n) work, O((n/p) log n) expected
+    time on p processes when the values are spread out"""
+    if algorithm not in ("quicksort", "mergesort"):
+        raise ValueError("algorithm must be 'quicksort' or 'mergesort'")
+
+    n = len(array)
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = min(processes, n)
+    if n <= 1:
+        return array
+
+    sample = sorted(array[random.randrange(n)] for _ in range(_SAMPLES_PER_BUCKET * processes))
+    splitters = [sample[_SAMPLES_PER_BUCKET * i] for i in range(1, processes)]
+
+    # the buckets are written to the scratch block, and sorted back into the source block
+    source_block = SharedMemory(create=True, size=8 * n)
+    scratch_block = SharedMemory(create=True, size=8 * n)
+    try:
+        source = source_block.buf.cast("q")[:n]
+        source[:] = typed_array("q", array)
+        source.release()
+
+        # boundaries of the chunks, each n / processes long
+        bounds = [n * i // processes for i in range(processes + 1)]
+
+        with Pool(processes) as pool:
+            chunk_sizes = pool.starmap(
+                _bucket_chunk, [(source_block.name, scratch_block.name, n, bounds[i], bounds[i + 1],
+                                 splitters) for i in range(processes)])
+
+            # bucket b is made of the b-th piece of every chunk, and goes right after the
+            # buckets before it in the output
+            tasks = []
+            offset = 0
+            for bucket in range(len(splitters) + 1):
+                segments = []
+                for chunk, sizes in enumerate(chunk_sizes):
+                    start = bounds[chunk] + sum(sizes[:bucket])
+                    segments.append((start, start + sizes[bucket]))
+                tasks.append((scratch_block.name, source_block.name, n, segments, offset,
+                              algorithm, pivot_choice))
+                offset += sum(sizes[bucket] for sizes in chunk_sizes)
+            pool.starmap(_sort_bucket, tasks)
 
+        source = source_block.buf.cast("q")[:n]
+        array[:] = source.tolist()
+        source.release()
+    finally:
+        for block in (source_block, scratch_block):
+            block.close()
+            block.unlink()
 
+    return array
@@ -1,4 +1,8 @@
-from part1.chapter5 import _partition
+import math
+import random
+from bisect import bisect_left, bisect_right
+
+from part1.chapter5 import _partition, _insertion_sort_range, three_way_partition
 
 
 def _select(array, search_index, left, right):
@@ -20,4 +24,191 @@ def select(array, index):
     return _select(array, index, 0, len(array) - 1)
 
 
+def _median_of_medians(array, left, right):
+    """Helper function to dselect and multiselect. Sorts each group of 5 entries of
+    array[left:right + 1], gathers the group medians at the front of the range, and
+    recursively selects their median. Returns the index of this pivot, which is
+    guaranteed to be larger than and smaller than at least 30% of the range"""
+    num_groups = 0
+    for group_left in range(left, right + 1, 5):
+        group_right = min(group_left + 4, right)
+        _insertion_sort_range(array, group_left, group_right)
+
+        median_index = (group_left + group_right) // 2
+        array[left + num_groups], array[median_index] = \
+            array[median_index], array[left + num_groups]
+        num_groups += 1
+
+    pivot_index = left + (num_groups - 1) // 2
+    _dselect(array, pivot_index, left, left + num_groups - 1)
+    return pivot_index
+
+
+def _partition_around(array, left, right, pivot_index):
+    """Helper function to dselect and multiselect. Three way partitions array[left:right + 1]
+    around the entry at pivot_index, and returns the bounds (lt, gt) of the block of entries
+    equal to the pivot, which are all in their final sorted positions"""
+    smaller, larger = three_way_partition(array, left, right, lambda a, l, r: pivot_index)
+    return smaller[1] + 1, larger[0] - 1
+
+
+def _dselect(array, target, left, right):
+    """Rearranges array[left:right + 1] so that array[target] holds the entry that would be
+    there if the range was sorted"""
+    while right - left >= 5:
+        lt, gt = _partition_around(array, left, right, _median_of_medians(array, left, right))
+        if lt <= target <= gt:
+            return
+        elif target < lt:
+            right = lt - 1
+        else:
+            left = gt + 1
+    _insertion_sort_range(array, left, right)
+
+
+def dselect(array, index):
+    """Deterministic selection (DSelect). Returns the index-th smallest entry (1 indexed, like
+    select) using the median of medians as pivot, so the runtime is O(n) for every input,
+    including sorted input where select is quadratic. Rearranges the array in place"""
+    _dselect(array, index - 1, 0, len(array) - 1)
+    return array[index - 1]
+
+
+def _multiselect(array, targets, left, right):
+    """Helper function to multiselect. Places the entries for every (0 indexed, sorted)
+    target index inside array[left:right + 1] at their sorted positions"""
+    if len(targets) == 0:
+        return
+    if right - left < 5:
+        _insertion_sort_range(array, left, right)
+        return
+
+    lt, gt = _partition_around(array, left, right, _median_of_medians(array, left, right))
+
+    # targets inside [lt, gt] are already done, the rest are split between the two sides
+    _multiselect(array, targets[:bisect_left(targets, lt)], left, lt - 1)
+    _multiselect(array, targets[bisect_right(targets, gt):], gt + 1, right)
+
+
+def multiselect(array, ranks):
+    """Returns the order statistics for every rank in ranks (1 indexed, like select) with a
+    single recursive partitioning pass, for example the p50/p90/p99 entries of an array.
+    Each partition only recurses into the sides that still contain a requested rank, so the
+    runtime is O(n log k) for k ranks rather than O(nk). Rearranges the array in place"""
+    targets = sorted(set(rank - 1 for rank in ranks))
+    _multiselect(array, targets, 0, len(array) - 1)
+    return [array[rank - 1] for rank in ranks]
+
+
+class QuantileSketch:
+    """KLL quantile sketch (Karnin, Lang and Liberty). Approximates the quantiles of an
+    unbounded stream in fixed memory. Entries are kept in a stack of compactors, where an
+    entry at level h stands for 2^h entries of the stream. When a level overflows it is
+    sorted and every other entry (randomly the odd or the even ones) is promoted to the
+    level above. Sketches built on different parts of a stream can be merged.
+
+    The size parameter k bounds memory to about 3k entries, and the rank error of
+    quantile(q) is roughly 1/k of the stream length (pass error instead of k to choose k
+    from a target error)"""
+
+    def __init__(self, k=200, error=None):
+        if error is not None:
+            k = math.ceil(2 / error)
+        self.k = k
+        self.n = 0
+        self.compactors = [[]]
+        self.size = 0
+        self.max_size = self._max_size()
+
+    def _capacity(self, level):
+        # lower levels get geometrically smaller capacities, the top level gets k
+        depth = len(self.compactors) - level - 1
+        return math.ceil(self.k * (2 / 3) ** depth) + 1
+
+    def _max_size(self):
+        return sum(self._capacity(level) for level in range(len(self.compactors)))
+
+    def update(self, value):
+        """Adds one entry of the stream to the sketch- O(1) amortized runtime"""
+        self.compactors[0].append(value)
+        self.n += 1
+        self.size += 1
+        if self.size >= self.max_size:
+            self._compress()
+
+    def _compress(self):
+        """Compacts the lowest overflowing level into the level above it"""
+        for level in range(len(self.compactors)):
+            if len(self.compactors[level]) >= self._capacity(level):
+                if level + 1 == len(self.compactors):
+                    self.compactors.append([])
+                    self.max_size = self._max_size()
+
+                # promote every other entry of the sorted level, keeping one entry
+                # behind if the level has odd length
+                items = sorted(self.compactors[level])
+                leftover = [items.pop()] if len(items) % 2 == 1 else []
+                self.compactors[level + 1].extend(items[random.randint(0, 1)::2])
+                self.compactors[level] = leftover
+
+                self.size = sum(len(compactor) for compactor in self.compactors)
+                if self.size < self.max_size:
+                    break
+
+    def merge(self, other):
+        """Merges another sketch (e.g. one built by a worker process) into this one, which
+        then summarizes both streams"""
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        for level, compactor in enumerate(other.compactors):
+            self.compactors[level].extend(compactor)
+
+        self.n += other.n
+        self.size = sum(len(compactor) for compactor in self.compactors)
+        self.max_size = self._max_size()
+        while self.size >= self.max_size:
+            self._compress()
+
+    def quantile(self, q):
+        """Returns the approximate q-quantile (0 <= q <= 1), i.e. the entry that select would
+        return for rank ceil(q * n)- O(k log k) runtime"""
+        if self.n == 0:
+            raise ValueError("Sketch is empty")
+
+        weighted = sorted((value, 2 ** level)
+                          for level, compactor in enumerate(self.compactors)
+                          for value in compactor)
+        total_weight = sum(weight for _, weight in weighted)
+        target = max(1, math.ceil(q * total_weight))
+
+        cumulative_weight = 0
+        for value, weight in weighted:
+            cumulative_weight += weight
+            if cumulative_weight >= target:
+                return value
+        return weighted[-1][0]
+
+
+def verify_quantile_sketch(sketch, array, quantiles):
+    """Checks a sketch built on array against the exact answers, read off the sorted array,
+    which is also needed to find the rank of each of the sketch's answers. For every q in
+    quantiles, returns (q, sketch answer, exact answer, rank error), where the rank error is
+    the distance (as a fraction of n) between the rank of the sketch's answer in the array
+    and the requested rank ceil(q * n)"""
+    n = len(array)
+    sorted_array = sorted(array)
+    results = []
+    for q in quantiles:
+        rank = max(1, math.ceil(q * n))
+        exact = sorted_array[rank - 1]
+        estimate = sketch.quantile(q)
 
+        # with duplicates the estimate covers a whole range of ranks
+        lowest_rank = bisect_left(sorted_array, estimate) + 1
+        highest_rank = bisect_right(sorted_array, estimate)
+        if lowest_rank <= rank <= highest_rank:
+            rank_error = 0
+        else:
+            rank_error = min(abs(rank - lowest_rank), abs(rank - highest_rank)) / n
+        results.append((q, estimate, exact, rank_error))
+    return results
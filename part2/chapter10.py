@@ -1,17 +1,72 @@
-class MinHeap:
+import asyncio
+import heapq
+import math
+import queue
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from itertools import count
+
+
+class PriorityQueue(ABC):
+    """Interface shared by the priority queues in this module. Elements are ranked by
+    key(element), computed when they are added. add returns a handle to the element that
+    can later be passed to decrease_key"""
+
+    @abstractmethod
+    def add(self, value):
+        raise NotImplementedError
 
-    def __init__(self, array=None, key=lambda x: x):
+    @abstractmethod
+    def get_min(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    def extract_min(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    def decrease_key(self, handle, new_key):
+        raise NotImplementedError
+
+    @abstractmethod
+    def size(self):
+        raise NotImplementedError
+
+    def is_empty(self):
+        return self.size() == 0
+
+
+class HeapHandle:
+    """Stable reference to an element of a MinHeap, returned by add. index is the element's
+    current position in the heap, kept up to date as it moves, or None once it has been
+    removed"""
+    __slots__ = ("value", "index")
+
+    def __init__(self, value, index):
+        self.value = value
+        self.index = index
+
+
+class MinHeap(PriorityQueue):
+    """Binary min heap. The key of each element is computed once, when it enters the heap,
+    and stored in a list parallel to the elements, so sifting only compares cached keys.
+    An element's key must not change while it is in the heap, other than through
+    decrease_key. If track_positions is True, every element gets a HeapHandle, which add
+    returns and which decrease_key and delete take. Handles work for duplicate elements"""
+
+    def __init__(self, array=None, key=lambda x: x, track_positions=False):
         # initialize a function to be used to compare objects in the heap
         self.function = key
 
-        # store a reference to the position of each object as within the queue
-        # object: position
-        self.positions = {}
+        # store a handle for each object, in a list parallel to the heap
+        self.handles = [] if track_positions else None
 
         # if no array is provided initialize an empty array
         # otherwise heapify provided array
         if array is None:
             self.data = []
+            self.keys = []
         else:
             self.data = array
             self.heapify()
@@ -29,11 +84,16 @@ class MinHeap:
         return (index - 1) // 2
 
     def add(self, value):
-        """Insert an element into the heap- O(log n) runtime"""
+        """Insert an element into the heap and return its handle (None if positions aren't
+        tracked)- O(log n) runtime"""
         self.data.append(value)
-        new_node_index = len(self.data) - 1
-        self.positions[value] = len(self.data) - 1
-        self._bubble_up(new_node_index)
+        self.keys.append(self.function(value))
+        handle = None
+        if self.handles is not None:
+            handle = HeapHandle(value, len(self.data) - 1)
+            self.handles.append(handle)
+        self._bubble_up(len(self.data) - 1)
+        return handle
 
     def get_min(self):
         """Returns minimum element of heap without deleting it- O(1) runtime"""
@@ -41,141 +101,450 @@ class MinHeap:
 
     def extract_min(self):
         """Removes and returns minimum element of heap- O(log n) runtime"""
-        if len(self.data) == 1:
-            return self.data.pop()
-
-        heap_min = self.data[0]
-        self.data[0] = self.data.pop()
-        self.positions[self.data[0]] = 0
-        self._bubble_down(0)
-
-        return heap_min
+        return self.delete_by_index(0)
 
     def delete_by_index(self, index):
         """Deletes any element of the heap given a pointer to its index in the
         array- O(log n) runtime"""
-
-        # if the array has length 1, or we are deleting the last element
-        # no need to bubble up/ down
-        if len(self.data) == 1:
-            return self.data.pop()
-        if index == len(self.data) - 1:
-            return self.data.pop()
-
-        object_to_delete = self.data[index]
-
-        # replace object to delete with last element
-        self.data[index] = self.data.pop()
-
-        # delete the object from the positions dictionary
-        del self.positions[object_to_delete]
+        data = self.data
+        keys = self.keys
+        handles = self.handles
+
+        # invalidate the handle of the object to delete
+        if handles is not None:
+            handles[index].index = None
+            last_handle = handles.pop()
+
+        # replace object to delete with last element, unless it is the last element,
+        # in which case there is no need to bubble up/ down
+        last_value = data.pop()
+        last_key = keys.pop()
+        if index == len(data):
+            return last_value
+
+        object_to_delete = data[index]
+        data[index] = last_value
+        keys[index] = last_key
+        if handles is not None:
+            handles[index] = last_handle
 
         # restore invariant
-        self._bubble_up(index)
-        self._bubble_down(index)
+        if index > 0 and last_key < keys[self.parent_node_index(index)]:
+            self._bubble_up(index)
+        else:
+            self._bubble_down(index)
 
         return object_to_delete
 
+    def delete(self, handle):
+        """Deletes the element with the given handle- O(log n) runtime"""
+        if handle.index is None:
+            raise AttributeError("Handle not in heap")
+        return self.delete_by_index(handle.index)
+
+    def decrease_key(self, handle, new_key):
+        """Lowers the key of the element with the given handle to new_key and moves it up
+        to its new position- O(log n) runtime"""
+        index = handle.index
+        if index is None:
+            raise AttributeError("Handle not in heap")
+        if self.keys[index] < new_key:
+            raise ValueError("New key is larger than the current key")
+        self.keys[index] = new_key
+        self._bubble_up(index)
+
     def heapify(self):
         """Turn an array into a heap- O(n) runtime"""
-        for i in range(len(self.data) - 1, -1, -1):
+        self.keys = list(map(self.function, self.data))
+        if self.handles is not None:
+            self.handles = [HeapHandle(value, index) for index, value in enumerate(self.data)]
+        for i in range(self.parent_node_index(len(self.data) - 1), -1, -1):
             self._bubble_down(i)
 
     def _bubble_up(self, new_node_index):
-        """Move node up the tree until invariant is restored"""
+        """Move node up the tree until invariant is restored. Rather than swapping at every
+        level, larger parents are moved down into the hole and the node is written once"""
+        data = self.data
+        keys = self.keys
+        handles = self.handles
+        value = data[new_node_index]
+        key = keys[new_node_index]
+        if handles is not None:
+            handle = handles[new_node_index]
 
-        # update positions dict
-        self.positions[self.data[new_node_index]] = new_node_index
+        # run if the new node is not at root and parent node is larger
+        while new_node_index > 0:
+            parent_index = (new_node_index - 1) >> 1
+            parent_key = keys[parent_index]
+            if not key < parent_key:
+                break
+            data[new_node_index] = data[parent_index]
+            keys[new_node_index] = parent_key
+            if handles is not None:
+                parent_handle = handles[new_node_index] = handles[parent_index]
+                parent_handle.index = new_node_index
+            new_node_index = parent_index
 
-        parent_index = self.parent_node_index(new_node_index)
+        data[new_node_index] = value
+        keys[new_node_index] = key
+        if handles is not None:
+            handles[new_node_index] = handle
+            handle.index = new_node_index
+
+    def _bubble_down(self, new_node_index):
+        """Move node down tree until invariant is restored, moving smaller children up into
+        the hole like _bubble_up"""
+        data = self.data
+        keys = self.keys
+        handles = self.handles
+        size = len(data)
+        value = data[new_node_index]
+        key = keys[new_node_index]
+        if handles is not None:
+            handle = handles[new_node_index]
+
+        # run as long as the new node has a child node with a smaller key
+        child_index = 2 * new_node_index + 1
+        while child_index < size:
+            # pick the smaller of the children nodes
+            child_key = keys[child_index]
+            right_index = child_index + 1
+            if right_index < size and keys[right_index] < child_key:
+                child_index = right_index
+                child_key = keys[right_index]
+            if not child_key < key:
+                break
+            data[new_node_index] = data[child_index]
+            keys[new_node_index] = child_key
+            if handles is not None:
+                child_handle = handles[new_node_index] = handles[child_index]
+                child_handle.index = new_node_index
+            new_node_index = child_index
+            child_index = 2 * new_node_index + 1
+
+        data[new_node_index] = value
+        keys[new_node_index] = key
+        if handles is not None:
+            handles[new_node_index] = handle
+            handle.index = new_node_index
+
+    def is_empty(self):
+        """Return true if heap is empty (self.data=[]), false otherwise"""
+        return len(self.data) == 0
+
+    def size(self):
+        """Returns size of heap"""
+        return len(self.data)
 
-        # run if the new node is not at root and parent node is larger
-        while new_node_index > 0 and self.function(self.data[new_node_index]) < \
-                self.function(self.data[parent_index]):
-            # swap node with parent node
-            self.data[new_node_index], self.data[parent_index] = \
-                self.data[parent_index], self.data[new_node_index]
 
-            # update positions dict
-            self.positions[self.data[new_node_index]] = new_node_index
-            self.positions[self.data[parent_index]] = parent_index
+class DaryHeap(MinHeap):
+    """MinHeap where every node has arity children instead of two. The tree is shallower,
+    making add and decrease_key cheaper, while extract_min compares more children per
+    level. 4 children usually beats 2 when decrease_key is frequent, as in Dijkstra's
+    algorithm on dense graphs"""
 
-            # reset node index and recalculate parent index
+    def __init__(self, array=None, key=lambda x: x, track_positions=False, arity=4):
+        self.arity = arity
+        super().__init__(array, key, track_positions)
+
+    def parent_node_index(self, index):
+        return (index - 1) // self.arity
+
+    def _bubble_up(self, new_node_index):
+        """Move node up the tree until invariant is restored, moving parents into the hole"""
+        data = self.data
+        keys = self.keys
+        handles = self.handles
+        arity = self.arity
+        value = data[new_node_index]
+        key = keys[new_node_index]
+        if handles is not None:
+            handle = handles[new_node_index]
+
+        while new_node_index > 0:
+            parent_index = (new_node_index - 1) // arity
+            parent_key = keys[parent_index]
+            if not key < parent_key:
+                break
+            data[new_node_index] = data[parent_index]
+            keys[new_node_index] = parent_key
+            if handles is not None:
+                parent_handle = handles[new_node_index] = handles[parent_index]
+                parent_handle.index = new_node_index
             new_node_index = parent_index
-            parent_index = self.parent_node_index(new_node_index)
+
+        data[new_node_index] = value
+        keys[new_node_index] = key
+        if handles is not None:
+            handles[new_node_index] = handle
+            handle.index = new_node_index
 
     def _bubble_down(self, new_node_index):
-        """Move node down tree until invariant is restored"""
+        """Move node down tree until invariant is restored, moving the smallest child into
+        the hole"""
+        data = self.data
+        keys = self.keys
+        handles = self.handles
+        arity = self.arity
+        size = len(data)
+        value = data[new_node_index]
+        key = keys[new_node_index]
+        if handles is not None:
+            handle = handles[new_node_index]
+
+        first_child = arity * new_node_index + 1
+        while first_child < size:
+            # find the smallest of up to arity children
+            child_index = first_child
+            child_key = keys[first_child]
+            for i in range(first_child + 1, min(first_child + arity, size)):
+                if keys[i] < child_key:
+                    child_index = i
+                    child_key = keys[i]
+            if not child_key < key:
+                break
+            data[new_node_index] = data[child_index]
+            keys[new_node_index] = child_key
+            if handles is not None:
+                child_handle = handles[new_node_index] = handles[child_index]
+                child_handle.index = new_node_index
+            new_node_index = child_index
+            first_child = arity * new_node_index + 1
+
+        data[new_node_index] = value
+        keys[new_node_index] = key
+        if handles is not None:
+            handles[new_node_index] = handle
+            handle.index = new_node_index
+
+
+class PairingNode:
+    """Node of a PairingHeap, which is also the element's handle. previous is the parent
+    for a leftmost child and the left sibling otherwise"""
+    __slots__ = ("value", "key", "child", "sibling", "previous", "in_heap")
+
+    def __init__(self, value, key):
+        self.value = value
+        self.key = key
+        self.child = None
+        self.sibling = None
+        self.previous = None
+        self.in_heap = True
+
+
+class PairingHeap(PriorityQueue):
+    """Pairing heap: a heap-ordered tree of any shape, stored as leftmost child and right
+    sibling pointers. add and decrease_key just link trees together in O(1) time, and
+    extract_min restores a single tree by pairing up the root's children, in O(log n)
+    amortized time"""
 
-        # update positions dict
-        self.positions[self.data[new_node_index]] = new_node_index
+    def __init__(self, array=None, key=lambda x: x):
+        self.function = key
+        self.root = None
+        self.count = 0
+        for value in array or ():
+            self.add(value)
 
-        # run as long as the new node has a child node with a smaller key
-        while self._has_smaller_child(new_node_index):
-            # return smaller of the children nodes
-            smaller_child_index = self._smaller_child_index(new_node_index)
-
-            # swap node with smaller child
-            self.data[new_node_index], self.data[smaller_child_index] = \
-                self.data[smaller_child_index], self.data[new_node_index]
-
-            # update positions of these elements in positions dict
-            self.positions[self.data[new_node_index]] = new_node_index
-            self.positions[self.data[smaller_child_index]] = smaller_child_index
-
-            # reset index of new node to that where it was switched
-            new_node_index = smaller_child_index
-
-    def _has_smaller_child(self, index):
-        """Helper function to determine whether a node posses a child with a smaller key,
-        which violates the heap property"""
-
-        # check if left and right children exist
-        left_index = self.left_child_index(index)
-        right_index = self.right_child_index(index)
-        left_child_exists = left_index <= len(self.data) - 1
-        right_child_exists = right_index <= len(self.data) - 1
-
-        # if left child exists check if its smaller
-        if left_child_exists:
-            left_child_smaller = \
-                self.function(self.data[index]) > self.function(self.data[left_index])
-        else:
-            left_child_smaller = False
+    @staticmethod
+    def _link(first, second):
+        """Makes the root with the larger key the leftmost child of the other root, and
+        returns the new root"""
+        if second.key < first.key:
+            first, second = second, first
+        second.previous = first
+        second.sibling = first.child
+        if first.child is not None:
+            first.child.previous = second
+        first.child = second
+        first.sibling = None
+        return first
+
+    def add(self, value):
+        """Insert an element into the heap and return its handle- O(1) runtime"""
+        node = PairingNode(value, self.function(value))
+        self.root = node if self.root is None else self._link(self.root, node)
+        self.count += 1
+        return node
 
-        # if right child exists check if its smaller
-        if right_child_exists:
-            right_child_smaller = \
-                self.function(self.data[index]) > self.function(self.data[right_index])
+    def get_min(self):
+        """Returns minimum element of heap without deleting it- O(1) runtime"""
+        return self.root.value
+
+    def extract_min(self):
+        """Removes and returns minimum element of heap- O(log n) amortized runtime"""
+        root = self.root
+        root.in_heap = False
+        self.count -= 1
+
+        # first pass: link the children in pairs from left to right
+        pairs = []
+        child = root.child
+        while child is not None:
+            second = child.sibling
+            if second is None:
+                child.previous = child.sibling = None
+                pairs.append(child)
+                break
+            next_child = second.sibling
+            child.previous = child.sibling = second.previous = second.sibling = None
+            pairs.append(self._link(child, second))
+            child = next_child
+
+        # second pass: link the pairs together from right to left
+        new_root = pairs.pop() if pairs else None
+        while pairs:
+            new_root = self._link(pairs.pop(), new_root)
+        if new_root is not None:
+            new_root.previous = None
+        self.root = new_root
+
+        root.child = None
+        return root.value
+
+    def decrease_key(self, handle, new_key):
+        """Lowers the key of the element with the given handle, cutting its subtree out and
+        linking it with the root- O(1) runtime"""
+        if not handle.in_heap:
+            raise AttributeError("Handle not in heap")
+        if handle.key < new_key:
+            raise ValueError("New key is larger than the current key")
+        handle.key = new_key
+        if handle is self.root:
+            return
+
+        # cut the subtree rooted at the node out of its parent's list of children
+        previous = handle.previous
+        if previous.child is handle:
+            previous.child = handle.sibling
         else:
-            right_child_smaller = False
+            previous.sibling = handle.sibling
+        if handle.sibling is not None:
+            handle.sibling.previous = previous
+        handle.previous = handle.sibling = None
+
+        self.root = self._link(self.root, handle)
 
-        # return true if one of the children is smaller
-        # return false if children don't exist or are larger
-        return left_child_smaller or right_child_smaller
+    def size(self):
+        return self.count
+
+
+class RadixEntry:
+    """Element of a RadixHeap, which is also the element's handle. bucket and index locate
+    the entry, index being its position in the bucket list"""
+    __slots__ = ("value", "key", "bucket", "index")
 
-    def _smaller_child_index(self, index):
-        """Helper function that returns the index of the child node with the smaller key"""
-        left_index = self.left_child_index(index)
-        right_index = self.right_child_index(index)
+    def __init__(self, value, key):
+        self.value = value
+        self.key = key
+        self.bucket = None
+        self.index = None
 
-        # if right child doesn't exist then return left child
-        if right_index >= len(self.data):
-            return left_index
 
-        # otherwise, return index of child with smaller index
-        if self.function(self.data[right_index]) < self.function(self.data[left_index]):
-            return right_index
+class RadixHeap(PriorityQueue):
+    """Radix heap for monotone non-negative integer keys, as in Dijkstra's algorithm with
+    integer edge weights: no key may be smaller than the last key extracted. An element
+    with key k goes in bucket b, the bit length of k XOR last, so all keys in a bucket
+    share their bits above b with last, and float('inf') keys wait in a bucket of their
+    own. extract_min only searches a bucket when bucket 0 is empty, and then moves its
+    elements into lower buckets, so each element is moved at most once per bit of the key-
+    O(log C) amortized runtime for keys up to C"""
+
+    def __init__(self, array=None, key=lambda x: x):
+        self.function = key
+        self.last = 0
+        self.buckets = [[]]
+        self.infinite = []
+        self.count = 0
+        for value in array or ():
+            self.add(value)
+
+    def _insert(self, entry):
+        key = entry.key
+        if key == float("inf"):
+            bucket = self.infinite
+            entry.bucket = -1
         else:
-            return left_index
+            if key < self.last:
+                raise ValueError("Keys must not be smaller than the last extracted key")
+            bucket_index = (key ^ self.last).bit_length()
+            while bucket_index >= len(self.buckets):
+                self.buckets.append([])
+            bucket = self.buckets[bucket_index]
+            entry.bucket = bucket_index
+        entry.index = len(bucket)
+        bucket.append(entry)
+
+    def _remove(self, entry):
+        """Removes the entry from its bucket by moving the bucket's last entry into its
+        place"""
+        bucket = self.infinite if entry.bucket == -1 else self.buckets[entry.bucket]
+        last_entry = bucket.pop()
+        if last_entry is not entry:
+            bucket[entry.index] = last_entry
+            last_entry.index = entry.index
 
-    def is_empty(self):
-        """Return true if heap is empty (self.data=[]), false otherwise"""
-        return len(self.data) == 0
+    def add(self, value):
+        """Insert an element into the heap and return its handle- O(1) runtime"""
+        entry = RadixEntry(value, self.function(value))
+        self._insert(entry)
+        self.count += 1
+        return entry
+
+    def _min_bucket(self):
+        """Helper function to extract_min. Returns the bucket holding the smallest key. Unless
+        bucket 0, which holds the keys equal to last, already has elements, last is raised to
+        the smallest key of the first nonempty bucket and that bucket is redistributed"""
+        buckets = self.buckets
+        if buckets[0]:
+            return buckets[0]
+        for bucket_index in range(1, len(buckets)):
+            if buckets[bucket_index]:
+                entries = buckets[bucket_index]
+                buckets[bucket_index] = []
+                self.last = min(entry.key for entry in entries)
+                for entry in entries:
+                    self._insert(entry)
+                return buckets[0]
+        # only infinite keys are left
+        return self.infinite
+
+    def get_min(self):
+        """Returns minimum element of heap without deleting it. Nothing is moved and last is
+        left alone, so keys added afterwards only need to be at least the last extracted key-
+        O(size of the first nonempty bucket) runtime"""
+        buckets = self.buckets
+        if buckets[0]:
+            return buckets[0][-1].value
+        for bucket in buckets:
+            if bucket:
+                return min(bucket, key=lambda entry: entry.key).value
+        return self.infinite[-1].value
+
+    def extract_min(self):
+        """Removes and returns minimum element of heap- O(log C) amortized runtime"""
+        bucket = self._min_bucket()
+        entry = bucket.pop()
+        if bucket is self.infinite:
+            self.last = entry.key
+        entry.bucket = entry.index = None
+        self.count -= 1
+        return entry.value
+
+    def decrease_key(self, handle, new_key):
+        """Lowers the key of the element with the given handle and moves it to its new
+        bucket- O(1) runtime"""
+        if handle.bucket is None:
+            raise AttributeError("Handle not in heap")
+        if handle.key < new_key:
+            raise ValueError("New key is larger than the current key")
+        if new_key < self.last:
+            raise ValueError("Keys must not be smaller than the last extracted key")
+        self._remove(handle)
+        handle.key = new_key
+        self._insert(handle)
 
     def size(self):
-        """Returns size of heap"""
-        return len(self.data)
+        return self.count
 
 
 def heap_median_maintenance_sum(array):
@@ -212,3 +581,280 @@ def heap_median_maintenance_sum(array):
 
         total += current_median
     return total
+
+
+def _prune(heap, delayed, sign):
+    """Helper function for sliding_window_percentile. Pops samples that have left the
+    window off the top of a heap, sign being -1 for the max heap of negated samples"""
+    while heap:
+        value = sign * heap[0]
+        count = delayed.get(value)
+        if not count:
+            return
+        if count == 1:
+            del delayed[value]
+        else:
+            delayed[value] = count - 1
+        heapq.heappop(heap)
+
+
+def _compact(heap, delayed, sign):
+    """Helper function for sliding_window_percentile. Removes every sample that has left
+    the window from a heap, for when too many of them are buried below the top"""
+    kept = []
+    for stored in heap:
+        value = sign * stored
+        count = delayed.get(value)
+        if count:
+            if count == 1:
+                del delayed[value]
+            else:
+                delayed[value] = count - 1
+        else:
+            kept.append(stored)
+    heapq.heapify(kept)
+    heap[:] = kept
+
+
+def sliding_window_percentile(samples, window, percentile=50):
+    """Generator that yields, for each sample, the given percentile of the last window
+    samples (of all samples so far, until there are window of them). The p-th percentile
+    of k samples is the one with rank ceil(p * k / 100), at least 1, so the 50th is the
+    median as in heap_median_maintenance_sum.
+
+    Same two heap idea as heap_median_maintenance_sum: a max heap holds the samples up to
+    the wanted rank and a min heap holds the rest. Samples that leave the window aren't
+    searched for, they are counted in a dictionary per heap and only popped when they reach
+    the top (lazy deletion). A heap that ends up more than half stale is compacted, so both
+    stay O(W) in size- O(log W) amortized runtime per sample"""
+    if window < 1:
+        raise ValueError("window must be at least 1")
+    if not 0 <= percentile <= 100:
+        raise ValueError("percentile must be between 0 and 100")
+
+    lower = []  # max heap of negated samples, up to and including the percentile
+    upper = []  # min heap of the larger samples
+    lower_size = upper_size = 0  # number of samples in each heap that are in the window
+    # sample value: number of copies that left the window but are still in the heap
+    lower_delayed = {}
+    upper_delayed = {}
+    recent = deque()
+
+    for sample in samples:
+        if lower and sample <= -lower[0]:
+            heapq.heappush(lower, -sample)
+            lower_size += 1
+        else:
+            heapq.heappush(upper, sample)
+            upper_size += 1
+        recent.append(sample)
+
+        # remove the oldest sample. Every sample in the lower heap is no larger than every
+        # sample in the upper heap, so comparing with the lower heap's top tells which heap
+        # it's in, and it only needs popping right away if it is on top
+        if len(recent) > window:
+            old = recent.popleft()
+            if old <= -lower[0]:
+                lower_delayed[old] = lower_delayed.get(old, 0) + 1
+                lower_size -= 1
+                if old == -lower[0]:
+                    _prune(lower, lower_delayed, -1)
+                elif len(lower) > 2 * lower_size + 16:
+                    _compact(lower, lower_delayed, -1)
+            else:
+                upper_delayed[old] = upper_delayed.get(old, 0) + 1
+                upper_size -= 1
+                if old == upper[0]:
+                    _prune(upper, upper_delayed, 1)
+                elif len(upper) > 2 * upper_size + 16:
+                    _compact(upper, upper_delayed, 1)
+
+        # move samples between the heaps until the lower heap holds exactly rank of them
+        rank = max(1, math.ceil(percentile * len(recent) / 100))
+        while lower_size > rank:
+            heapq.heappush(upper, -heapq.heappop(lower))
+            lower_size -= 1
+            upper_size += 1
+            _prune(lower, lower_delayed, -1)
+        while lower_size < rank:
+            heapq.heappush(lower, -heapq.heappop(upper))
+            lower_size += 1
+            upper_size -= 1
+            _prune(upper, upper_delayed, 1)
+
+        yield -lower[0]
+
+
+def sliding_window_median(samples, window):
+    """Generator that yields the median of the last window samples for each sample"""
+    return sliding_window_percentile(samples, window, 50)
+
+
+class BlockingPriorityQueue:
+    """Thread-safe priority queue for feeding worker threads, built on MinHeap. get returns
+    the item with the smallest key, items with equal keys in the order they were put. If
+    maxsize is positive, put blocks while the queue is full, so fast producers are held
+    back by slow consumers. Like queue.Queue, put and get take block and timeout and raise
+    queue.Full and queue.Empty"""
+
+    def __init__(self, key=lambda x: x, maxsize=0):
+        # the key is computed once per item, and the counter breaks ties in put order
+        tie_breaker = count()
+        self.heap = MinHeap(key=lambda item: (key(item), next(tie_breaker)))
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.not_empty = threading.Condition(self.lock)
+        self.not_full = threading.Condition(self.lock)
+
+    def qsize(self):
+        with self.lock:
+            return self.heap.size()
+
+    def empty(self):
+        return self.qsize() == 0
+
+    def full(self):
+        with self.lock:
+            return 0 < self.maxsize <= self.heap.size()
+
+    @staticmethod
+    def _wait(condition, predicate, block, timeout, exception):
+        """Waits on condition, whose lock is held, until predicate is true, raising exception
+        if it isn't by the timeout or right away if block is False"""
+        if not block:
+            if not predicate():
+                raise exception
+        elif not condition.wait_for(predicate, timeout):
+            raise exception
+
+    def put(self, item, block=True, timeout=None):
+        """Adds an item, waiting up to timeout seconds for space if the queue is full"""
+        with self.not_full:
+            if self.maxsize > 0:
+                self._wait(self.not_full, lambda: self.heap.size() < self.maxsize,
+                           block, timeout, queue.Full)
+            self.heap.add(item)
+            self.not_empty.notify()
+
+    def put_many(self, items, block=True, timeout=None):
+        """Adds all the items under one acquisition of the lock. If the queue is bounded it
+        waits for room for all of them at once, so len(items) must not exceed maxsize"""
+        items = list(items)
+        with self.not_full:
+            if self.maxsize > 0:
+                if len(items) > self.maxsize:
+                    raise ValueError("Can't put more than maxsize items at once")
+                self._wait(self.not_full, lambda: self.heap.size() + len(items) <= self.maxsize,
+                           block, timeout, queue.Full)
+            for item in items:
+                self.heap.add(item)
+            self.not_empty.notify(len(items))
+
+    def get(self, block=True, timeout=None):
+        """Removes and returns the item with the smallest key, waiting up to timeout seconds
+        for one if the queue is empty"""
+        with self.not_empty:
+            self._wait(self.not_empty, lambda: not self.heap.is_empty(), block, timeout, queue.Empty)
+            item = self.heap.extract_min()
+            self.not_full.notify()
+            return item
+
+    def get_many(self, max_items, block=True, timeout=None):
+        """Removes and returns up to max_items items in key order, waiting up to timeout
+        seconds for the first one. Taking a batch per acquisition of the lock cuts down on
+        lock traffic when consumers process items quickly"""
+        with self.not_empty:
+            self._wait(self.not_empty, lambda: not self.heap.is_empty(), block, timeout, queue.Empty)
+            items = [self.heap.extract_min() for _ in range(min(max_items, self.heap.size()))]
+            self.not_full.notify(len(items))
+            return items
+
+
+class AsyncPriorityQueue:
+    """asyncio version of BlockingPriorityQueue, for coroutines on one event loop. Waiting
+    coroutines park a future in a FIFO of getters or putters and are woken one at a time,
+    like asyncio.Queue. put and get raise TimeoutError after timeout seconds, and the
+    _nowait versions raise asyncio.QueueFull and asyncio.QueueEmpty"""
+
+    def __init__(self, key=lambda x: x, maxsize=0):
+        tie_breaker = count()
+        self.heap = MinHeap(key=lambda item: (key(item), next(tie_breaker)))
+        self.maxsize = maxsize
+        self.getters = deque()
+        self.putters = deque()
+
+    def qsize(self):
+        return self.heap.size()
+
+    def empty(self):
+        return self.heap.is_empty()
+
+    def full(self):
+        return 0 < self.maxsize <= self.heap.size()
+
+    @staticmethod
+    def _wake(waiters, number=1):
+        """Wakes up to number waiting coroutines, skipping those that were cancelled"""
+        while waiters and number > 0:
+            waiter = waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                number -= 1
+
+    async def _wait(self, waiters, blocked, timeout):
+        """Waits until blocked() is false. A woken coroutine checks again, since another one
+        may have run first and taken the item or the space"""
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while blocked():
+            waiter = loop.create_future()
+            waiters.append(waiter)
+            try:
+                if deadline is None:
+                    await waiter
+                else:
+                    try:
+                        await asyncio.wait_for(waiter, deadline - loop.time())
+                    except asyncio.TimeoutError:
+                        # before Python 3.11 this isn't the builtin TimeoutError
+                        raise TimeoutError from None
+            except BaseException:
+                waiter.cancel()
+                if waiter in waiters:
+                    waiters.remove(waiter)
+                elif not blocked():
+                    # this coroutine was woken but won't use it, so pass it on
+                    self._wake(waiters)
+                raise
+
+    def put_nowait(self, item):
+        if self.full():
+            raise asyncio.QueueFull
+        self.heap.add(item)
+        self._wake(self.getters)
+
+    def get_nowait(self):
+        if self.empty():
+            raise asyncio.QueueEmpty
+        item = self.heap.extract_min()
+        self._wake(self.putters)
+        return item
+
+    async def put(self, item, timeout=None):
+        """Adds an item, waiting up to timeout seconds for space if the queue is full"""
+        await self._wait(self.putters, self.full, timeout)
+        self.put_nowait(item)
+
+    async def get(self, timeout=None):
+        """Removes and returns the item with the smallest key, waiting up to timeout seconds
+        for one if the queue is empty"""
+        await self._wait(self.getters, self.empty, timeout)
+        return self.get_nowait()
+
+    async def get_many(self, max_items, timeout=None):
+        """Removes and returns up to max_items items in key order, waiting up to timeout
+        seconds for the first one"""
+        await self._wait(self.getters, self.empty, timeout)
+        items = [self.heap.extract_min() for _ in range(min(max_items, self.heap.size()))]
+        self._wake(self.putters, len(items))
+        return items
@@ -1,11 +1,28 @@
-def two_sum(array, target_range):
+import math
+import mmap
+import struct
+from array import array as typed_array
+from bisect import bisect_left, bisect_right
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed for the vectorized bulk operations
+    np = None
+
+
+def two_sum(array, target_range, compact=False):
     """Returns number of distinct pairs of entries in an array
-    sum to a value contained in the target range"""
+    sum to a value contained in the target range. If compact is set the hash table is an
+    IntHashTable instead of a dict, which takes far less memory for large integer arrays"""
 
     # initialize a hash table with the contents of the array
-    hash_table = {}
-    for entry in array:
-        hash_table[entry] = True
+    if compact:
+        hash_table = IntHashTable()
+        hash_table.add_many(array)
+    else:
+        hash_table = {}
+        for entry in array:
+            hash_table[entry] = True
 
     counter = 0
     for target in target_range:
@@ -14,8 +31,453 @@ def two_sum(array, target_range):
         # and make sure they are distinct
         for x in array:
             y = target - x
-            if y != x and hash_table.get(y) is not None:
+            if y != x and y in hash_table:
                 counter += 1
                 break
     return counter
 
+
+def sorted_two_sum(array, target_range):
+    """Same result as two_sum, but sorts the distinct entries once instead of scanning the
+    whole array for every target. For each entry x, the partners y > x that reach a target
+    in [min target, max target] form a contiguous window of the sorted entries, found by
+    binary search, and every sum in a window is marked as reachable.
+    O(n log n + number of pairs in windows) runtime"""
+    if len(target_range) == 0:
+        return 0
+    lo = min(target_range)
+    hi = max(target_range)
+
+    # two_sum only counts pairs of distinct values, so duplicates can be dropped
+    values = sorted(set(array))
+
+    reachable = set()
+    for i, x in enumerate(values):
+        start = bisect_left(values, lo - x, i + 1)
+        end = bisect_right(values, hi - x, i + 1)
+        for j in range(start, end):
+            target = x + values[j]
+            if target in target_range:
+                reachable.add(target)
+    return len(reachable)
+
+
+def bucket_two_sum(array, target_range):
+    """Same result as two_sum, using a hash table of buckets instead of sorting. Entries are
+    bucketed by x // w, where w is the width of the target range, so all partners of x
+    lie in at most two buckets. O(n + number of pairs in those buckets) expected runtime"""
+    if len(target_range) == 0:
+        return 0
+    lo = min(target_range)
+    hi = max(target_range)
+    width = hi - lo + 1
+
+    buckets = {}
+    for x in set(array):
+        buckets.setdefault(x // width, []).append(x)
+
+    reachable = set()
+    for bucket in buckets.values():
+        for x in bucket:
+            # partners y satisfy lo - x <= y <= hi - x, which spans at most two buckets
+            for bucket_id in range((lo - x) // width, (hi - x) // width + 1):
+                for y in buckets.get(bucket_id, ()):
+                    target = x + y
+                    if y > x and lo <= target <= hi and target in target_range:
+                        reachable.add(target)
+    return len(reachable)
+
+
+# Fibonacci hashing: multiplying by 2^64 / golden ratio and keeping the top bits spreads
+# consecutive integer keys evenly over the table
+_HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+_MASK = (1 << 64) - 1
+
+
+class IntHashTable:
+    """Open addressing hash table for 64-bit integer keys, with linear probing. Keys (and
+    optionally values) live in flat array.array columns with a bytearray of occupied flags,
+    about 17 bytes per slot for a map and 9 for a set, instead of a dict entry plus boxed
+    ints per key. The table doubles whenever it gets fuller than load_factor.
+    add_many and contains_many work on whole arrays at once, and are vectorized when NumPy
+    is installed"""
+
+    def __init__(self, capacity=8, load_factor=0.5, store_values=False):
+        if not 0 < load_factor < 1:
+            raise ValueError("load_factor must be between 0 and 1")
+        self.load_factor = load_factor
+        self.store_values = store_values
+        self.len = 0
+
+        # capacity is always a power of two so the top bits of the hash give the slot
+        num_bits = max(3, (max(1, capacity) - 1).bit_length())
+        self._allocate(num_bits)
+
+    def _allocate(self, num_bits):
+        self.num_bits = num_bits
+        self.capacity = 1 << num_bits
+        self.keys = typed_array("q", bytes(8 * self.capacity))
+        self.values = typed_array("q", bytes(8 * self.capacity)) if self.store_values else None
+        self.used = bytearray(self.capacity)
+
+    def __len__(self):
+        return self.len
+
+    def _slot(self, key):
+        return ((key * _HASH_MULTIPLIER) & _MASK) >> (64 - self.num_bits)
+
+    def _find(self, key):
+        """Returns the slot holding key, or the empty slot where it would go"""
+        slot = self._slot(key)
+        while self.used[slot] and self.keys[slot] != key:
+            slot = (slot + 1) & (self.capacity - 1)
+        return slot
+
+    def _grow(self, new_len):
+        """Rehashes into a bigger table if new_len keys would exceed the load factor"""
+        if new_len <= self.load_factor * self.capacity:
+            return
+        num_bits = self.num_bits
+        while new_len > self.load_factor * (1 << num_bits):
+            num_bits += 1
+
+        old_keys, old_values, old_used = self.keys, self.values, self.used
+        self._allocate(num_bits)
+        if np is not None:
+            occupied = np.flatnonzero(np.frombuffer(old_used, dtype=np.uint8))
+            keys = np.frombuffer(old_keys, dtype=np.int64)[occupied]
+            values = None if old_values is None else \
+                np.frombuffer(old_values, dtype=np.int64)[occupied]
+        else:
+            occupied = [slot for slot in range(len(old_used)) if old_used[slot]]
+            keys = [old_keys[slot] for slot in occupied]
+            values = None if old_values is None else [old_values[slot] for slot in occupied]
+
+        # the keys get counted again as they are reinserted
+        self.len = 0
+        self._insert_many(keys, values)
+
+    def insert(self, key, value=0):
+        """Inserts key (with value, if the table stores values), overwriting the value of
+        an existing key- O(1) expected runtime"""
+        self._grow(self.len + 1)
+        slot = self._find(key)
+        if not self.used[slot]:
+            self.used[slot] = 1
+            self.keys[slot] = key
+            self.len += 1
+        if self.values is not None:
+            self.values[slot] = value
+
+    def add(self, key):
+        self.insert(key)
+
+    def get(self, key, default=None):
+        """Returns the value stored for key (or True for a table without values), or
+        default if key is missing- O(1) expected runtime"""
+        slot = self._find(key)
+        if not self.used[slot]:
+            return default
+        return True if self.values is None else self.values[slot]
+
+    def __contains__(self, key):
+        return bool(self.used[self._find(key)])
+
+    def add_many(self, keys, values=None):
+        """Inserts every key of a list, array.array or NumPy array (with the matching
+        entries of values, if the table stores values)"""
+        if np is not None:
+            keys = np.asarray(keys, dtype=np.int64)
+            if values is not None:
+                values = np.asarray(values, dtype=np.int64)
+            elif self.values is not None:
+                values = np.zeros(len(keys), dtype=np.int64)
+
+            # duplicate keys only need to be inserted once (keeping the last value)
+            keys, reverse_index = np.unique(keys[::-1], return_index=True)
+            if values is not None:
+                values = values[::-1][reverse_index]
+        else:
+            keys = list(keys)
+            if self.values is not None and values is None:
+                values = [0] * len(keys)
+        self._grow(self.len + len(keys))
+        self._insert_many(keys, values)
+
+    def _insert_many(self, keys, values):
+        """Inserts keys, which are distinct, into a table that is already big enough"""
+        if np is None:
+            for i, key in enumerate(keys):
+                slot = self._find(key)
+                if not self.used[slot]:
+                    self.used[slot] = 1
+                    self.keys[slot] = key
+                    self.len += 1
+                if self.values is not None:
+                    self.values[slot] = values[i]
+            return
+
+        keys = np.asarray(keys, dtype=np.int64)
+        if values is not None:
+            values = np.asarray(values, dtype=np.int64)
+        table_keys = np.frombuffer(self.keys, dtype=np.int64)
+        used = np.frombuffer(self.used, dtype=np.uint8)
+        table_values = None if self.values is None else np.frombuffer(self.values, dtype=np.int64)
+
+        # all keys probe in parallel. In each round, keys that reach their own key stop
+        # (only the value changes), and of the keys that reach an empty slot the first one
+        # claims it. Everyone else moves on to the next slot
+        slots = self._slots_vectorized(keys)
+        pending = np.arange(len(keys))
+        while len(pending) > 0:
+            pending_slots = slots[pending]
+            is_empty = used[pending_slots] == 0
+            is_match = ~is_empty & (table_keys[pending_slots] == keys[pending])
+
+            if table_values is not None:
+                table_values[pending_slots[is_match]] = values[pending[is_match]]
+
+            claimed_slots, first = np.unique(pending_slots[is_empty], return_index=True)
+            winners = pending[is_empty][first]
+            used[claimed_slots] = 1
+            table_keys[claimed_slots] = keys[winners]
+            if table_values is not None:
+                table_values[claimed_slots] = values[winners]
+            self.len += len(winners)
+
+            done = is_match
+            done[np.flatnonzero(is_empty)[first]] = True
+            pending = pending[~done]
+            slots[pending] = (slots[pending] + 1) & (self.capacity - 1)
+
+    def _slots_vectorized(self, keys):
+        hashes = keys.astype(np.uint64) * np.uint64(_HASH_MULTIPLIER)
+        return (hashes >> np.uint64(64 - self.num_bits)).astype(np.int64)
+
+    def contains_many(self, keys):
+        """Membership test for every key of a list, array.array or NumPy array. Returns a
+        NumPy bool array if NumPy is installed, otherwise a list of bools"""
+        if np is None:
+            return [key in self for key in keys]
+
+        keys = np.asarray(keys, dtype=np.int64)
+        table_keys = np.frombuffer(self.keys, dtype=np.int64)
+        used = np.frombuffer(self.used, dtype=np.uint8)
+
+        # probe all keys in parallel until each one hits its key or an empty slot
+        found = np.zeros(len(keys), dtype=bool)
+        slots = self._slots_vectorized(keys)
+        pending = np.arange(len(keys))
+        while len(pending) > 0:
+            pending_slots = slots[pending]
+            is_empty = used[pending_slots] == 0
+            is_match = ~is_empty & (table_keys[pending_slots] == keys[pending])
+            found[pending[is_match]] = True
+
+            pending = pending[~(is_empty | is_match)]
+            slots[pending] = (slots[pending] + 1) & (self.capacity - 1)
+        return found
+
+
+def _mix64(x):
+    """SplitMix64 finalizer, turns an integer into a well spread 64-bit hash"""
+    z = (x + _HASH_MULTIPLIER) & _MASK
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK
+    return z ^ (z >> 31)
+
+
+def _mix64_vectorized(x):
+    """Same as _mix64 for a NumPy uint64 array (uint64 arithmetic wraps around mod 2^64)"""
+    z = x + np.uint64(_HASH_MULTIPLIER)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+class BloomFilter:
+    """Bloom filter for 64-bit integer keys. Membership tests never give false negatives,
+    and give false positives with about the requested probability once expected_items keys
+    have been added. The k positions of a key come from double hashing, h1 + i * h2, and
+    are bits of a bytearray. add_many and contains_many work on whole arrays at once, and
+    are vectorized when NumPy is installed. A filter can be saved to disk and memory mapped
+    back with load, without copying it into memory"""
+
+    # file layout: 8 byte magic string, then the number of positions, the number of hash
+    # functions and the number of keys added, followed by the table
+    _MAGIC = b"BLOOMF\x00\x00"
+    _HEADER = struct.Struct("<8sQQQ")
+
+    def __init__(self, expected_items, false_positive_rate=0.01):
+        if not 0 < false_positive_rate < 1:
+            raise ValueError("false_positive_rate must be between 0 and 1")
+
+        # optimal sizes: m = -n ln(p) / ln(2)^2 positions and k = (m / n) ln(2) hashes
+        expected_items = max(1, expected_items)
+        num_positions = math.ceil(-expected_items * math.log(false_positive_rate) / math.log(2) ** 2)
+        num_hashes = max(1, round(num_positions / expected_items * math.log(2)))
+        self._initialize(num_positions, num_hashes, 0, None)
+
+    def _initialize(self, num_positions, num_hashes, count, table):
+        self.num_positions = max(8, num_positions)
+        self.num_hashes = num_hashes
+        self.count = count
+        self.table = self._new_table() if table is None else table
+        self._mmap = None
+
+    def _new_table(self):
+        # one bit per position
+        return bytearray((self.num_positions + 7) // 8)
+
+    def __len__(self):
+        """Number of keys added"""
+        return self.count
+
+    def _positions(self, key):
+        h1 = _mix64(key & _MASK)
+        h2 = _mix64(h1) | 1
+        return [((h1 + i * h2) & _MASK) % self.num_positions for i in range(self.num_hashes)]
+
+    def _positions_vectorized(self, keys):
+        """(len(keys), num_hashes) array of the positions of every key"""
+        h1 = _mix64_vectorized(np.asarray(keys, dtype=np.int64).astype(np.uint64))
+        h2 = _mix64_vectorized(h1) | np.uint64(1)
+        i = np.arange(self.num_hashes, dtype=np.uint64)
+        positions = (h1[:, None] + i[None, :] * h2[:, None]) % np.uint64(self.num_positions)
+        return positions.astype(np.int64)
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.table[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.table[position >> 3] & (1 << (position & 7))
+                   for position in self._positions(key))
+
+    def add_many(self, keys):
+        """Adds every key of a list, array.array or NumPy array"""
+        if np is None:
+            for key in keys:
+                self.add(key)
+            return
+
+        positions = self._positions_vectorized(keys).ravel()
+        table = np.frombuffer(self.table, dtype=np.uint8)
+        bits = np.left_shift(1, positions & 7).astype(np.uint8)
+        np.bitwise_or.at(table, positions >> 3, bits)
+        self.count += len(keys)
+
+    def contains_many(self, keys):
+        """Membership test for every key of a list, array.array or NumPy array. Returns a
+        NumPy bool array if NumPy is installed, otherwise a list of bools"""
+        if np is None:
+            return [key in self for key in keys]
+
+        positions = self._positions_vectorized(keys)
+        table = np.frombuffer(self.table, dtype=np.uint8)
+        is_set = (table[positions >> 3] >> (positions & 7).astype(np.uint8)) & 1
+        return is_set.all(axis=1)
+
+    def save(self, filename):
+        with open(filename, "wb") as file:
+            file.write(self._HEADER.pack(self._MAGIC, self.num_positions, self.num_hashes,
+                                         self.count))
+            file.write(self.table)
+
+    @classmethod
+    def load(cls, filename, writable=False):
+        """Memory maps a filter written by save. The table is used straight from the page
+        cache, so loading takes O(1) time and memory. The filter is read only unless
+        writable is set, in which case changes are written through to the file (call
+        flush to also write back the number of keys)"""
+        with open(filename, "r+b" if writable else "rb") as file:
+            mapped = mmap.mmap(file.fileno(), 0,
+                               access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+
+        magic, num_positions, num_hashes, count = cls._HEADER.unpack_from(mapped)
+        if magic != cls._MAGIC:
+            raise ValueError(f"{filename} does not hold a {cls.__name__}")
+
+        bloom_filter = cls.__new__(cls)
+        bloom_filter._initialize(num_positions, num_hashes, count,
+                                 memoryview(mapped)[cls._HEADER.size:])
+        bloom_filter._mmap = mapped
+        return bloom_filter
+
+    def flush(self):
+        """Writes the number of keys and any pending changes of a filter loaded with
+        writable=True back to its file"""
+        if self._mmap is not None:
+            self._HEADER.pack_into(self._mmap, 0, self._MAGIC, self.num_positions,
+                                   self.num_hashes, self.count)
+            self._mmap.flush()
+
+
+class CountingBloomFilter(BloomFilter):
+    """Bloom filter that keeps an 8-bit counter per position instead of a bit, so keys can
+    be removed again. Counters saturate at 255 and are never decremented after that, which
+    keeps removals from causing false negatives"""
+
+    _MAGIC = b"CBLOOMF\x00"
+
+    def _new_table(self):
+        return bytearray(self.num_positions)
+
+    def add(self, key):
+        for position in self._positions(key):
+            if self.table[position] < 255:
+                self.table[position] += 1
+        self.count += 1
+
+    def remove(self, key):
+        """Removes a key that was added before. Removing a key that was never added can
+        cause false negatives for other keys"""
+        if key not in self:
+            raise AttributeError("Key not in filter")
+        for position in self._positions(key):
+            if self.table[position] < 255:
+                self.table[position] -= 1
+        self.count -= 1
+
+    def __contains__(self, key):
+        return all(self.table[position] for position in self._positions(key))
+
+    def _update_counters(self, keys, sign):
+        """Adds sign to the counters of every key's positions. Only the touched counters
+        are read and written, so small batches don't cost O(m)"""
+        table = np.frombuffer(self.table, dtype=np.uint8)
+        positions, counts = np.unique(self._positions_vectorized(keys).ravel(), return_counts=True)
+
+        # saturated counters stay at 255
+        current = table[positions].astype(np.int64)
+        updated = np.clip(current + sign * counts, 0, 255)
+        table[positions] = np.where(current == 255, 255, updated)
+
+    def add_many(self, keys):
+        if np is None:
+            for key in keys:
+                self.add(key)
+            return
+        self._update_counters(keys, 1)
+        self.count += len(keys)
+
+    def remove_many(self, keys):
+        """Removes every key of a list, array.array or NumPy array. Like remove, raises
+        AttributeError if any key is not in the filter, in which case nothing is removed"""
+        if np is None:
+            if not all(key in self for key in keys):
+                raise AttributeError("Key not in filter")
+            for key in keys:
+                self.remove(key)
+            return
+        if not self.contains_many(keys).all():
+            raise AttributeError("Key not in filter")
+        self._update_counters(keys, -1)
+        self.count -= len(keys)
+
+    def contains_many(self, keys):
+        if np is None:
+            return [key in self for key in keys]
+        table = np.frombuffer(self.table, dtype=np.uint8)
+        return (table[self._positions_vectorized(keys)] > 0).all(axis=1)
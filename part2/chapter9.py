@@ -1,5 +1,6 @@
 import queue
 from abc import ABC, abstractmethod
+from functools import partial
 
 from part2.chapter10 import MinHeap
 
@@ -410,16 +411,21 @@ class DirectedGraph(Graph):
 
         return {vertex.name: vertex.distance for vertex in self.vertices.values()}
 
-    def efficient_dijkstra(self, starting_vertex_name: int):
+    def efficient_dijkstra(self, starting_vertex_name: int,
+                           queue_factory=partial(MinHeap, track_positions=True)):
         """Dijkstra's algorithm making use of a priority queue. Returns a dictionary of all
-        vertices and their distance from the starting vertex"""
+        vertices and their distance from the starting vertex. queue_factory(key=...) must
+        return an empty PriorityQueue whose add returns handles, e.g. PairingHeap, or
+        RadixHeap when the edge weights are integers"""
 
         self.clear_distances()
         starting_vertex = self.vertices[starting_vertex_name]
         starting_vertex.distance = 0
 
-        # initialize a priority queue with all vertices and loop until queue is empty
-        priority_q = MinHeap(array=list(self.vertices.values()), key=lambda v: v.distance)
+        # initialize a priority queue with all vertices, keeping the handle of each one,
+        # and loop until queue is empty
+        priority_q = queue_factory(key=lambda v: v.distance)
+        handles = {vertex.name: priority_q.add(vertex) for vertex in self.vertices.values()}
 
         while not priority_q.is_empty():
 
@@ -431,11 +437,8 @@ class DirectedGraph(Graph):
             for edge in current_vertex.outgoing_edges:
                 if current_vertex.distance + edge.weight < edge.to_vertex.distance:
 
-                    # delete vertex from queue
-                    to_vertex_index = priority_q.positions[edge.to_vertex]
-                    priority_q.delete_by_index(to_vertex_index)
-                    # change vertex distance and reinsert in queue
+                    # change vertex distance and move it up the queue
                     edge.to_vertex.distance = current_vertex.distance + edge.weight
-                    priority_q.add(edge.to_vertex)
+                    priority_q.decrease_key(handles[edge.to_vertex.name], edge.to_vertex.distance)
 
         return {vertex.name: vertex.distance for vertex in self.vertices.values()}
@@ -1,5 +1,11 @@
+import random
 from dataclasses import dataclass
 
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed for JobTable
+    np = None
+
 
 @dataclass
 class Job:
@@ -23,3 +29,233 @@ def greedy_difference(jobs: list[Job]) -> list[Job]:
 def greedy_ratio(jobs: list[Job]) -> list[Job]:
     return sorted(jobs, key=lambda job: job.weight/job.length, reverse=True)
 
+
+# number of jobs whose weighted completion times are summed with NumPy at a time before
+# being added to an exact Python int
+_SUM_CHUNK_SIZE = 1 << 20
+
+# a chunk is only summed in int64 if its weighted sum is bounded by this (2^62 leaves room
+# for the rounding of the bound, which is computed in floating point)
+_INT64_SUM_BOUND = float(1 << 62)
+
+
+@dataclass(eq=False)
+class JobTable:
+    """Columnar version of a list of Jobs for schedules with millions of jobs: the weights
+    and lengths are two int64 NumPy arrays, and the greedy orderings and the objective are
+    computed with vectorized operations instead of Python loops. Requires NumPy"""
+    weights: "np.ndarray"
+    lengths: "np.ndarray"
+
+    def __post_init__(self):
+        if np is None:
+            raise ImportError("JobTable requires numpy")
+        self.weights = np.asarray(self.weights, dtype=np.int64)
+        self.lengths = np.asarray(self.lengths, dtype=np.int64)
+        if self.weights.shape != self.lengths.shape:
+            raise ValueError("weights and lengths must have the same length")
+
+    def __len__(self):
+        return len(self.weights)
+
+    @classmethod
+    def from_jobs(cls, jobs: list[Job]) -> "JobTable":
+        return cls([job.weight for job in jobs], [job.length for job in jobs])
+
+    @classmethod
+    def from_file(cls, filename: str) -> "JobTable":
+        """Reads a file with one "weight length" pair per line (the problem13.4.txt format)
+        straight into the two columns"""
+        numbers = np.fromfile(filename, dtype=np.int64, sep=" ")
+        return cls(numbers[0::2], numbers[1::2])
+
+    def to_jobs(self) -> list[Job]:
+        return [Job(weight, length)
+                for weight, length in zip(self.weights.tolist(), self.lengths.tolist())]
+
+    def reorder(self, order) -> "JobTable":
+        return JobTable(self.weights[order], self.lengths[order])
+
+    def difference_order(self):
+        """Indices of the jobs by decreasing weight - length. Ties keep their original
+        order, exactly like greedy_difference"""
+        return np.argsort(-(self.weights - self.lengths), kind="stable")
+
+    def ratio_order(self):
+        """Indices of the jobs by decreasing weight / length. Ties keep their original
+        order, exactly like greedy_ratio"""
+        return np.argsort(-(self.weights / self.lengths), kind="stable")
+
+    def greedy_difference(self) -> "JobTable":
+        return self.reorder(self.difference_order())
+
+    def greedy_ratio(self) -> "JobTable":
+        return self.reorder(self.ratio_order())
+
+    def sum_weighted_completion_times(self) -> int:
+        """The completion times are a cumulative sum of the lengths- O(n) runtime. The jobs
+        are summed a chunk at a time, with the completion times in the chunk counted from
+        the start of the chunk in int64, and the time taken by the earlier chunks added
+        back with exact Python ints. A chunk whose sum could overflow int64 is summed with
+        Python ints instead, so the result is always exact"""
+        weighted_sum = 0
+        elapsed = 0
+        for start in range(0, len(self), _SUM_CHUNK_SIZE):
+            weights = self.weights[start:start + _SUM_CHUNK_SIZE]
+            lengths = self.lengths[start:start + _SUM_CHUNK_SIZE]
+
+            # every completion time in the chunk is at most the sum of its lengths
+            bound = float(np.abs(weights).max()) * float(np.abs(lengths).sum(dtype=np.float64)) \
+                * len(weights)
+            if bound >= _INT64_SUM_BOUND:
+                weights, lengths = weights.astype(object), lengths.astype(object)
+
+            completion_times = np.cumsum(lengths)
+            weighted_sum += int(np.dot(weights, completion_times)) + elapsed * int(weights.sum())
+            elapsed += int(completion_times[-1])
+        return weighted_sum
+
+
+class ScheduleNode:
+    """Node of the IncrementalScheduler treap. Besides its job, each node stores the totals of
+    its subtree: the sum of the weights, the sum of the lengths, and the weighted completion
+    time of the subtree's jobs when they are run on their own, starting at time 0"""
+
+    def __init__(self, job, sequence):
+        self.job = job
+        self.sequence = sequence  # insertion number, breaks ties between equal ratios
+        self.priority = random.random()
+        self.left = None
+        self.right = None
+        self.weight_sum = job.weight
+        self.length_sum = job.length
+        self.completion_sum = job.weight * job.length
+
+    def update(self):
+        left, right = self.left, self.right
+        weight_sum = self.job.weight
+        length_sum = self.job.length
+        completion_sum = 0
+        if left is not None:
+            weight_sum += left.weight_sum
+            length_sum += left.length_sum
+            completion_sum += left.completion_sum
+        # this job finishes after the whole left subtree
+        completion_sum += self.job.weight * length_sum
+        if right is not None:
+            # and every job on the right is delayed by the left subtree plus this job
+            completion_sum += right.completion_sum + right.weight_sum * length_sum
+            weight_sum += right.weight_sum
+            length_sum += right.length_sum
+        self.weight_sum = weight_sum
+        self.length_sum = length_sum
+        self.completion_sum = completion_sum
+
+
+def _precedes(node1, node2):
+    """Helper function for IncrementalScheduler. Whether node1's job comes before node2's in
+    the greedy ratio order, comparing weight/length exactly by cross multiplying"""
+    job1, job2 = node1.job, node2.job
+    product1, product2 = job1.weight * job2.length, job2.weight * job1.length
+    if product1 != product2:
+        return product1 > product2
+    return node1.sequence < node2.sequence
+
+
+class IncrementalScheduler:
+    """Keeps a set of jobs in greedy_ratio order in a treap augmented with subtree sums, so a
+    job can be added or removed in O(log n) expected time and the sum of weighted completion
+    times of the optimal schedule is read off the root in O(1) time. Gives the same value as
+    sum_weighted_completion_times(greedy_ratio(jobs))"""
+
+    def __init__(self, jobs=()):
+        self.root = None
+        self.size = 0
+        self._sequence = 0
+        for job in jobs:
+            self.insert(job)
+
+    def __len__(self):
+        return self.size
+
+    def insert(self, job: Job) -> ScheduleNode:
+        """Adds the job to the schedule and returns its node, which is the handle to pass to
+        delete- O(log n) expected runtime"""
+        node = ScheduleNode(job, self._sequence)
+        self._sequence += 1
+        self.root = self._insert(self.root, node)
+        self.size += 1
+        return node
+
+    def _insert(self, current_node, node):
+        if current_node is None:
+            return node
+        if _precedes(node, current_node):
+            current_node.left = self._insert(current_node.left, node)
+            # rotate right if the new node has the higher priority
+            if current_node.left.priority > current_node.priority:
+                child = current_node.left
+                current_node.left = child.right
+                current_node.update()
+                child.right = current_node
+                current_node = child
+        else:
+            current_node.right = self._insert(current_node.right, node)
+            # rotate left if the new node has the higher priority
+            if current_node.right.priority > current_node.priority:
+                child = current_node.right
+                current_node.right = child.left
+                current_node.update()
+                child.left = current_node
+                current_node = child
+        current_node.update()
+        return current_node
+
+    def delete(self, node: ScheduleNode):
+        """Removes the job with the given handle from the schedule- O(log n) expected runtime"""
+        self.root = self._delete(self.root, node)
+        self.size -= 1
+
+    def _delete(self, current_node, node):
+        if current_node is None:
+            raise AttributeError("Job not in schedule")
+        if current_node is node:
+            return self._merge(node.left, node.right)
+        if _precedes(node, current_node):
+            current_node.left = self._delete(current_node.left, node)
+        else:
+            current_node.right = self._delete(current_node.right, node)
+        current_node.update()
+        return current_node
+
+    def _merge(self, left, right):
+        """Joins two treaps where every job in left comes before every job in right"""
+        if left is None:
+            return right
+        if right is None:
+            return left
+        if left.priority > right.priority:
+            left.right = self._merge(left.right, right)
+            left.update()
+            return left
+        right.left = self._merge(left, right.left)
+        right.update()
+        return right
+
+    def total(self) -> int:
+        """Sum of weighted completion times of the greedy ratio schedule- O(1) runtime"""
+        return 0 if self.root is None else self.root.completion_sum
+
+    def jobs(self) -> list[Job]:
+        """The jobs in schedule order- O(n) runtime"""
+        job_list = []
+        stack = []
+        current_node = self.root
+        while stack or current_node is not None:
+            while current_node is not None:
+                stack.append(current_node)
+                current_node = current_node.left
+            current_node = stack.pop()
+            job_list.append(current_node.job)
+            current_node = current_node.right
+        return job_list
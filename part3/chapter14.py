@@ -1,3 +1,18 @@
+import mmap
+import os
+import re
+import struct
+import sys
+import time
+from array import array as typed_array
+from collections import Counter
+from multiprocessing import Pool
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed to count bytes faster in count_frequencies
+    np = None
+
 from part2.chapter10 import MinHeap
 
 
@@ -41,9 +56,92 @@ def huffman_code(alphabet: list[HuffNode]) -> InnerNode:
     return priority_q.get_min()
 
 
+class HuffmanTree:
+    """A Huffman tree stored in flat arrays instead of node objects. Nodes 0..n-1 are the
+    leaves, in the same order as the alphabet, and nodes n..2n-2 are the inner nodes in the
+    order they were created, so the root is the last node and every child has a smaller
+    index than its parent. left_child[i] and right_child[i] are the children of node n + i"""
+
+    def __init__(self, symbols, left_child, right_child):
+        self.symbols = symbols
+        self.left_child = left_child
+        self.right_child = right_child
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def depths(self):
+        """Returns an array of the encoding length of each leaf, in alphabet order. Since
+        children have smaller indices than their parents, one pass from the root down to
+        the first inner node visits every parent before its children- O(n) runtime"""
+        n = len(self.symbols)
+        depth = typed_array("l", bytes(typed_array("l").itemsize * max(2 * n - 1, 0)))
+        left_child, right_child = self.left_child, self.right_child
+        for node in range(2 * n - 2, n - 1, -1):
+            child_depth = depth[node] + 1
+            depth[left_child[node - n]] = child_depth
+            depth[right_child[node - n]] = child_depth
+        return depth[:n]
+
+    def encoding_length_stats(self, frequencies=None):
+        """Returns the min, max and average encoding lengths from a single depth pass. If
+        the frequencies are given (in alphabet order), also returns the average encoding
+        length weighted by frequency"""
+        lengths = self.depths()
+        stats = (min(lengths), max(lengths), sum(lengths) / len(lengths))
+        if frequencies is None:
+            return stats
+        weighted_sum = sum(length * frequency for length, frequency in zip(lengths, frequencies))
+        return stats + (weighted_sum / sum(frequencies),)
+
+
+def two_queue_huffman_code(alphabet: list[HuffNode], presorted=False) -> HuffmanTree:
+    """An O(n) algorithm to generate a Huffman code when the alphabet is already sorted by
+    frequency (otherwise it is sorted first, in O(n log n) time). Merged trees are created
+    in non-decreasing order of frequency, so instead of a heap the algorithm only needs two
+    FIFO queues- the sorted leaves and the merged trees- and the two smallest trees are
+    always at their fronts. Returns a HuffmanTree"""
+    n = len(alphabet)
+    if n == 0:
+        raise ValueError("Alphabet must contain at least one symbol")
+
+    if presorted:
+        leaf_queue = range(n)
+    else:
+        leaf_queue = sorted(range(n), key=lambda i: alphabet[i].frequency)
+
+    # frequencies of every node, leaves first and then the inner nodes as they are created
+    frequency = [node.frequency for node in alphabet]
+    left_child = typed_array("l")
+    right_child = typed_array("l")
+
+    leaf_front = 0
+    inner_front = n
+    for inner_node in range(n, 2 * n - 1):
+        children = []
+        for _ in range(2):
+            # take the front of whichever queue holds the smaller tree, preferring leaves on
+            # ties, which keeps the maximum encoding length down
+            if leaf_front < n and (inner_front == inner_node or
+                                   frequency[leaf_queue[leaf_front]] <= frequency[inner_front]):
+                children.append(leaf_queue[leaf_front])
+                leaf_front += 1
+            else:
+                children.append(inner_front)
+                inner_front += 1
+        left_child.append(children[0])
+        right_child.append(children[1])
+        frequency.append(frequency[children[0]] + frequency[children[1]])
+
+    return HuffmanTree([node.symbol for node in alphabet], left_child, right_child)
+
+
 def get_encoding_lengths(root, current_level=0, depths=None):
     """Returns a dictionary of the encoding lengths for each symbol
     in the alphabet"""
+    if isinstance(root, HuffmanTree):
+        return dict(zip(root.symbols, root.depths()))
+
     if depths is None:
         depths = {}
 
@@ -68,3 +166,349 @@ def average_encoding_lengths(root):
     symbols_and_lengths = get_encoding_lengths(root)
     lengths = list(symbols_and_lengths.values())
     return sum(lengths)/len(lengths)
+
+
+def length_limited_code(alphabet: list[HuffNode], max_length: int) -> dict:
+    """Package-merge algorithm (Larmore and Hirschberg) for the optimal prefix-free code in
+    which no encoding is longer than max_length. Returns a dictionary of the encoding
+    lengths for each symbol, like get_encoding_lengths- O(n * max_length) runtime.
+
+    Coins of every symbol are placed at each of the max_length levels, worth the symbol's
+    frequency. Going up from the deepest level, the items of a level are paired into
+    packages which are merged with the next level's coins. The 2n - 2 cheapest items of
+    the top level are selected, and each symbol's encoding length is the number of its
+    coins that the selection contains, directly or through packages"""
+    n = len(alphabet)
+    if n > 1 << max_length:
+        raise ValueError(f"{n} symbols can't be encoded with at most {max_length} bits")
+    if n == 1:
+        return {alphabet[0].symbol: 0}
+
+    order = sorted(range(n), key=lambda i: alphabet[i].frequency)
+    coins = [alphabet[i].frequency for i in order]
+
+    # leaf_counts[level][m] is the number of coins among the first m items of the level,
+    # which is all that's needed to trace the selection back down
+    leaf_counts = []
+    items = coins
+    leaf_count = list(range(n + 1))
+    leaf_counts.append(leaf_count)
+    for _ in range(max_length - 1):
+        packages = [items[k] + items[k + 1] for k in range(0, len(items) - 1, 2)]
+        merged = []
+        leaf_count = [0]
+        coin_index = package_index = 0
+        while coin_index < n or package_index < len(packages):
+            # take coins before packages of equal weight
+            if package_index == len(packages) or \
+                    (coin_index < n and coins[coin_index] <= packages[package_index]):
+                merged.append(coins[coin_index])
+                coin_index += 1
+            else:
+                merged.append(packages[package_index])
+                package_index += 1
+            leaf_count.append(coin_index)
+        items = merged
+        leaf_counts.append(leaf_count)
+
+    # select the cheapest 2n - 2 items of the top level and follow the packages down
+    lengths = [0] * n
+    selected = 2 * n - 2
+    for leaf_count in reversed(leaf_counts):
+        coins_selected = leaf_count[selected]
+        for k in range(coins_selected):
+            lengths[k] += 1
+        selected = 2 * (selected - coins_selected)
+
+    return {alphabet[order[k]].symbol: lengths[k] for k in range(n)}
+
+
+def average_weighted_length(alphabet: list[HuffNode], encoding_lengths: dict) -> float:
+    """Average encoding length of the alphabet weighted by frequency"""
+    total_frequency = sum(node.frequency for node in alphabet)
+    return sum(encoding_lengths[node.symbol] * node.frequency for node in alphabet) / total_frequency
+
+
+def length_limit_penalty(alphabet: list[HuffNode], max_length: int):
+    """Returns the average weighted encoding length of the optimal code limited to max_length
+    bits, that of the unconstrained Huffman code, and the difference between them. The
+    unconstrained code is built by two_queue_huffman_code, which has the same cost as
+    huffman_code without rearranging the alphabet"""
+    limited = average_weighted_length(alphabet, length_limited_code(alphabet, max_length))
+    unconstrained = average_weighted_length(
+        alphabet, get_encoding_lengths(two_queue_huffman_code(alphabet)))
+    return limited, unconstrained, limited - unconstrained
+
+
+def canonical_codes(encoding_lengths: dict) -> dict:
+    """Assigns canonical Huffman codes given the encoding length of each symbol, e.g. from
+    get_encoding_lengths. Symbols are sorted by (length, symbol) and each one gets the next
+    integer code, shifted left whenever the length grows, so the code lengths alone are
+    enough to rebuild the code. Returns a dictionary of symbol -> (code, length)"""
+    codes = {}
+    code = 0
+    previous_length = 0
+    for symbol, length in sorted(encoding_lengths.items(), key=lambda item: (item[1], item[0])):
+        # a symbol needs at least one bit even if it is the only one in the alphabet
+        length = max(length, 1)
+        code <<= length - previous_length
+        codes[symbol] = (code, length)
+        code += 1
+        previous_length = length
+    return codes
+
+
+def byte_encoding_lengths(frequencies: dict, max_length=None) -> list[int]:
+    """Given a dictionary of byte value -> frequency, returns the Huffman encoding length of
+    each of the 256 byte values, with 0 for bytes that don't appear. If max_length is given
+    the lengths come from length_limited_code instead"""
+    encoding_lengths = [0] * 256
+    if frequencies:
+        alphabet = [HuffNode(byte, frequency) for byte, frequency in sorted(frequencies.items())]
+        if max_length is None:
+            symbol_lengths = get_encoding_lengths(two_queue_huffman_code(alphabet))
+        else:
+            symbol_lengths = length_limited_code(alphabet, max_length)
+        for byte, length in symbol_lengths.items():
+            encoding_lengths[byte] = max(length, 1)
+    return encoding_lengths
+
+
+class HuffmanEncoder:
+    """Streaming canonical Huffman encoder for bytes. Each call to encode returns the
+    complete bytes of output so far and carries the leftover bits over to the next call;
+    flush pads the last byte with zeros"""
+
+    def __init__(self, encoding_lengths: list[int]):
+        codes = canonical_codes({byte: length for byte, length in enumerate(encoding_lengths)
+                                 if length > 0})
+        # the code of each byte as a string of bits, so a whole chunk is encoded with one
+        # join and one int conversion instead of a loop over bits
+        self.bit_strings = [""] * 256
+        for byte, (code, length) in codes.items():
+            self.bit_strings[byte] = format(code, f"0{length}b")
+        self.leftover = ""
+
+    def encode(self, chunk: bytes) -> bytes:
+        bits = self.leftover + "".join(map(self.bit_strings.__getitem__, chunk))
+        complete = len(bits) - len(bits) % 8
+        self.leftover = bits[complete:]
+        if complete == 0:
+            return b""
+        return int(bits[:complete], 2).to_bytes(complete // 8, "big")
+
+    def flush(self) -> bytes:
+        if not self.leftover:
+            return b""
+        last_byte = int(self.leftover.ljust(8, "0"), 2).to_bytes(1, "big")
+        self.leftover = ""
+        return last_byte
+
+
+class HuffmanDecoder:
+    """Streaming table-driven canonical Huffman decoder. Instead of walking the tree one bit
+    at a time, the decoder reads a whole byte per step: a state is an unfinished code prefix
+    (an inner node of the tree), and for every state and input byte a lookup table holds the
+    decoded output and the next state. length is the number of bytes to decode, which tells
+    the decoder where the padding starts"""
+
+    def __init__(self, encoding_lengths: list[int], length: int):
+        codes = canonical_codes({byte: length for byte, length in enumerate(encoding_lengths)
+                                 if length > 0})
+        self.table, self.invalid_state = self._build_table(
+            {code: byte for byte, code in codes.items()})
+        self.state = 0
+        self.remaining = length
+
+    @staticmethod
+    def _build_table(symbols):
+        """Builds the flat (state * 256 + byte) -> (output, next state) table, starting from
+        the root (state 0) and adding states as they are reached. Bits that can't lead to
+        any code, which is only possible when the alphabet has one symbol, lead to an
+        invalid state that never leaves itself. Returns the table and the invalid state"""
+        max_length = max((length for _, length in symbols), default=0)
+        prefixes = [(0, 0)]
+        states = {(0, 0): 0}
+        table = []
+        for state, (start_code, start_length) in enumerate(prefixes):
+            if start_code is None:
+                table.extend([(b"", state)] * 256)
+                continue
+            for byte in range(256):
+                code, length = start_code, start_length
+                output = bytearray()
+                for shift in range(7, -1, -1):
+                    code = (code << 1) | ((byte >> shift) & 1)
+                    length += 1
+                    if (code, length) in symbols:
+                        output.append(symbols[(code, length)])
+                        code, length = 0, 0
+                    elif length >= max_length:
+                        code, length = None, None
+                        break
+                if (code, length) not in states:
+                    states[(code, length)] = len(prefixes)
+                    prefixes.append((code, length))
+                table.append((bytes(output), states[(code, length)]))
+        return table, states.get((None, None))
+
+    def decode(self, chunk: bytes) -> bytes:
+        table = self.table
+        state = self.state
+        pieces = []
+        for byte in chunk:
+            output, state = table[(state << 8) | byte]
+            pieces.append(output)
+        self.state = state
+        decoded = b"".join(pieces)[:self.remaining]
+        self.remaining -= len(decoded)
+        if state == self.invalid_state and self.remaining > 0:
+            raise ValueError("Invalid Huffman code")
+        return decoded
+
+
+# a compressed stream starts with the encoding length of every byte value followed by the
+# number of bytes that were compressed
+_HEADER = struct.Struct("<256BQ")
+
+
+def huffman_compress(data: bytes, max_length=None) -> bytes:
+    """Compresses data with a canonical Huffman code built from its byte frequencies, with
+    encodings of at most max_length bits if it is given"""
+    encoding_lengths = byte_encoding_lengths(Counter(data), max_length)
+    encoder = HuffmanEncoder(encoding_lengths)
+    return _HEADER.pack(*encoding_lengths, len(data)) + encoder.encode(data) + encoder.flush()
+
+
+def huffman_decompress(data: bytes) -> bytes:
+    """Inverse of huffman_compress"""
+    *encoding_lengths, length = _HEADER.unpack_from(data)
+    return HuffmanDecoder(encoding_lengths, length).decode(memoryview(data)[_HEADER.size:])
+
+
+def _read_chunks(file, chunk_size):
+    while chunk := file.read(chunk_size):
+        yield chunk
+
+
+def huffman_compress_file(input_filename, output_filename, chunk_size=1 << 20, max_length=None):
+    """Streaming version of huffman_compress. The input is read twice, once to count the
+    byte frequencies and once to encode it, chunk_size bytes at a time, so it never has to
+    fit in memory"""
+    frequencies = Counter()
+    length = 0
+    with open(input_filename, "rb") as file:
+        for chunk in _read_chunks(file, chunk_size):
+            frequencies.update(chunk)
+            length += len(chunk)
+
+    encoding_lengths = byte_encoding_lengths(frequencies, max_length)
+    encoder = HuffmanEncoder(encoding_lengths)
+    with open(input_filename, "rb") as input_file, open(output_filename, "wb") as output_file:
+        output_file.write(_HEADER.pack(*encoding_lengths, length))
+        for chunk in _read_chunks(input_file, chunk_size):
+            output_file.write(encoder.encode(chunk))
+        output_file.write(encoder.flush())
+
+
+def huffman_decompress_file(input_filename, output_filename, chunk_size=1 << 20):
+    """Streaming version of huffman_decompress"""
+    with open(input_filename, "rb") as input_file, open(output_filename, "wb") as output_file:
+        *encoding_lengths, length = _HEADER.unpack(input_file.read(_HEADER.size))
+        decoder = HuffmanDecoder(encoding_lengths, length)
+        for chunk in _read_chunks(input_file, chunk_size):
+            output_file.write(decoder.decode(chunk))
+
+
+# bytes.split() separates tokens at exactly these bytes
+_WHITESPACE = re.compile(rb"\s")
+
+
+def _chunk_bounds(filename, size, chunk_size, tokens):
+    """Helper function for count_frequencies. Cuts a file into chunks of about chunk_size
+    bytes. When counting tokens each cut is moved forward to the next whitespace byte so
+    that no token is split between two chunks"""
+    bounds = [0]
+    with open(filename, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        while bounds[-1] + chunk_size < size:
+            cut = bounds[-1] + chunk_size
+            if tokens:
+                match = _WHITESPACE.search(data, cut)
+                cut = size if match is None else match.start()
+            bounds.append(cut)
+    if bounds[-1] < size:
+        bounds.append(size)
+    return bounds
+
+
+def _count_chunk(filename, start, end, tokens):
+    """Worker task for count_frequencies. Maps the file and counts the bytes or the
+    whitespace separated tokens of data[start:end]. Returns the counts and the number of
+    bytes read"""
+    with open(filename, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        if tokens:
+            counts = Counter(data[start:end].split())
+        elif np is not None:
+            counts = np.bincount(np.frombuffer(data, dtype=np.uint8, count=end - start, offset=start),
+                                 minlength=256)
+        else:
+            counts = Counter(data[start:end])
+    return counts, end - start
+
+
+def _star_count_chunk(task):
+    return _count_chunk(*task)
+
+
+def print_progress(bytes_done, total_bytes, seconds):
+    """Default progress report for count_frequencies"""
+    throughput = bytes_done / seconds / 1e6 if seconds > 0 else 0.0
+    print(f"\r{bytes_done / 1e6:.1f}/{total_bytes / 1e6:.1f} MB "
+          f"({100 * bytes_done / max(total_bytes, 1):.0f}%) {throughput:.1f} MB/s",
+          end="\n" if bytes_done == total_bytes else "", file=sys.stderr, flush=True)
+
+
+def count_frequencies(filenames, tokens=False, chunk_size=64 << 20, processes=None,
+                      progress=print_progress) -> list[HuffNode]:
+    """Counts the byte frequencies (or, if tokens is True, the frequencies of whitespace
+    separated tokens) of one or more files and returns them as the list of HuffNodes that
+    huffman_code expects. Byte symbols are the byte values and token symbols are strings.
+
+    The files are memory mapped and cut into chunks that a pool of worker processes count
+    independently- with numpy's bincount for bytes, or a Counter for tokens- and the
+    per-chunk counts are added up as they arrive. After each chunk progress is called with
+    the bytes counted so far, the total bytes and the elapsed seconds; pass None to turn
+    reporting off"""
+    if isinstance(filenames, (str, os.PathLike)):
+        filenames = [filenames]
+
+    tasks = []
+    for filename in filenames:
+        size = os.path.getsize(filename)
+        if size > 0:
+            bounds = _chunk_bounds(filename, size, chunk_size, tokens)
+            tasks.extend((filename, bounds[i], bounds[i + 1], tokens) for i in range(len(bounds) - 1))
+    total_bytes = sum(end - start for _, start, end, _ in tasks)
+
+    byte_counts = [0] * 256
+    token_counts = Counter()
+    bytes_done = 0
+    start_time = time.perf_counter()
+    if tasks:
+        with Pool(processes) as pool:
+            for counts, chunk_bytes in pool.imap_unordered(_star_count_chunk, tasks):
+                if tokens:
+                    token_counts.update(counts)
+                elif isinstance(counts, Counter):
+                    for byte, count in counts.items():
+                        byte_counts[byte] += count
+                else:
+                    byte_counts = [total + count for total, count in zip(byte_counts, counts.tolist())]
+                bytes_done += chunk_bytes
+                if progress is not None:
+                    progress(bytes_done, total_bytes, time.perf_counter() - start_time)
+
+    if tokens:
+        return [HuffNode(token.decode("utf-8", errors="surrogateescape"), count)
+                for token, count in token_counts.items()]
+    return [HuffNode(byte, count) for byte, count in enumerate(byte_counts) if count > 0]
@@ -1,4 +1,5 @@
 import random
+from functools import partial
 
 from part2.chapter9 import UndirectedVertex, UndirectedEdge, UndirectedGraph
 from part2.chapter10 import MinHeap
@@ -38,6 +39,7 @@ class MSTGraph(UndirectedGraph):
     def clear_prim_winners(self):
         for vertex in self.vertices.values():
             vertex.prim_winner = None
+            vertex.key = float('inf')
 
     def prim(self):
         """Inefficient version of prims algorithm. Returns a minimum spanning tree
@@ -70,9 +72,10 @@ class MSTGraph(UndirectedGraph):
                 spanning_tree.add_edge(min_edge)
         return spanning_tree
 
-    def efficient_prim(self):
+    def efficient_prim(self, queue_factory=partial(MinHeap, track_positions=True)):
         """Efficient version of prims algorithm Returns the minimum spanning tree
-        in O(m log n) runtime"""
+        in O(m log n) runtime. queue_factory(key=...) must return an empty PriorityQueue
+        whose add returns handles"""
 
         # choose arbitrary starting vertex and initialize spanning tree
         starting_vertex = random.choice(list(self.vertices.values()))
@@ -91,10 +94,12 @@ class MSTGraph(UndirectedGraph):
             adjacent_vertex.prim_winner = edge
             adjacent_vertex.key = edge.weight
 
-        # initialize a priority queue of all vertices except starting vertex
-        starting_vertex.key = -float('inf')
-        priority_q = MinHeap(array=list(self.vertices.values()), key=lambda v: v.key)
-        priority_q.extract_min()
+        # initialize a priority queue of all vertices except starting vertex, which is
+        # already in the tree, keeping the handle of each one
+        starting_vertex.explored = True
+        priority_q = queue_factory(key=lambda v: v.key)
+        handles = {vertex.name: priority_q.add(vertex) for vertex in self.vertices.values()
+                   if vertex is not starting_vertex}
 
         # loop until all vertices are added to the spanning tree
         while not priority_q.is_empty():
@@ -112,13 +117,10 @@ class MSTGraph(UndirectedGraph):
             for edge in current_vertex.adjacent_edges:
                 if not edge.to_vertex.explored:
                     if edge.weight < edge.to_vertex.key:
-                        # delete vertex from queue
-                        to_vertex_index = priority_q.positions[edge.to_vertex]
-                        priority_q.delete_by_index(to_vertex_index)
-                        # change vertex distance and reinsert in queue
+                        # change vertex key and move it up the queue
                         edge.to_vertex.key = edge.weight
                         edge.to_vertex.prim_winner = edge
-                        priority_q.add(edge.to_vertex)
+                        priority_q.decrease_key(handles[edge.to_vertex.name], edge.weight)
 
         return spanning_tree
 
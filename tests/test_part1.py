@@ -1,7 +1,15 @@
-from part1.chapter1 import mergesort
-from part1.chapter3 import count_inv, closest_pair, inefficient_closest
-from part1.chapter5 import quicksort, left_pivot, right_pivot, median_pivot
-from part1.chapter6 import select
+import random
+from array import array
+
+import pytest
+
+from part1.chapter1 import mergesort, bottom_up_mergesort, external_mergesort
+from part1.chapter3 import count_inv, fenwick_count_inv, numpy_count_inv, closest_pair, \
+    inefficient_closest, grid_closest_pair, dist, KDTree, unimodal_max, equal_index, \
+    batch_unimodal_max, batch_equal_index
+from part1.chapter5 import quicksort, left_pivot, right_pivot, median_pivot, parallel_sort, \
+    three_way_partition, dual_pivot_partition, introsort
+from part1.chapter6 import select, dselect, multiselect, QuantileSketch, verify_quantile_sketch
 
 from tests import generate_tests
 
@@ -17,6 +25,37 @@ def test_mergesort():
     assert mergesort(array3) == sorted(array3)
 
 
+def test_bottom_up_mergesort():
+    array1 = [58, 32, 12, 100, 66, 19, 2, 28, 29, 75, 72]
+    assert bottom_up_mergesort(array1.copy()) == sorted(array1)
+    assert bottom_up_mergesort(array1.copy(), reverse=True) == sorted(array1, reverse=True)
+
+    # sorting must be stable in both directions
+    pairs = [(3, "a"), (1, "b"), (3, "c"), (2, "d"), (1, "e"), (3, "f")]
+    assert bottom_up_mergesort(pairs.copy(), key=lambda x: x[0]) == \
+           sorted(pairs, key=lambda x: x[0])
+    assert bottom_up_mergesort(pairs.copy(), key=lambda x: x[0], reverse=True) == \
+           sorted(pairs, key=lambda x: x[0], reverse=True)
+
+    # sorted in place, so typed buffers stay typed buffers
+    count_inv_test2 = generate_tests.create_list("../test_cases/part1_test_cases/problem3.5.txt")
+    typed_array = array("q", count_inv_test2)
+    assert bottom_up_mergesort(typed_array) is typed_array
+    assert typed_array.tolist() == sorted(count_inv_test2)
+
+
+def test_external_mergesort(tmp_path):
+    input_filename = "../test_cases/part1_test_cases/problem5.6.txt"
+    expected = sorted(generate_tests.create_list(input_filename))
+
+    # small runs and fan in force several intermediate merge passes
+    assert list(external_mergesort(input_filename, run_size=100, fan_in=3)) == expected
+
+    output_filename = tmp_path / "sorted.txt"
+    assert external_mergesort(input_filename, output_filename, run_size=1000) == len(expected)
+    assert generate_tests.create_list(output_filename) == expected
+
+
 def test_count_inv():
     array1 = list(range(1, 10))
     assert count_inv(array1) == 0
@@ -31,6 +70,30 @@ def test_count_inv():
     assert count_inv(count_inv_test2) == 2407905288
 
 
+def test_fenwick_count_inv():
+    assert fenwick_count_inv([]) == 0
+    assert fenwick_count_inv(list(range(10, 0, -1))) == 45
+
+    # equal entries are not inversions
+    array1 = [3, 1, 3, 2, 1, 3, 2]
+    assert fenwick_count_inv(array1) == count_inv(array1)
+
+    count_inv_test2 = generate_tests.create_list("../test_cases/part1_test_cases/problem3.5.txt")
+    assert fenwick_count_inv(count_inv_test2) == 2407905288
+
+
+def test_numpy_count_inv():
+    pytest.importorskip("numpy")
+    assert numpy_count_inv([]) == 0
+    assert numpy_count_inv(list(range(10, 0, -1))) == 45
+
+    array1 = [3, 1, 3, 2, 1, 3, 2]
+    assert numpy_count_inv(array1) == count_inv(array1)
+
+    count_inv_test2 = generate_tests.create_list("../test_cases/part1_test_cases/problem3.5.txt")
+    assert numpy_count_inv(count_inv_test2) == 2407905288
+
+
 def test_closest_pair():
     # we check the reversed order as well because the two closest pair
     # functions may return the pair in different orders
@@ -50,6 +113,88 @@ def test_closest_pair():
            inefficient_closest(points3) or inefficient_closest(points3)[::-1]
 
 
+def test_grid_closest_pair():
+    points1 = [(46, 16), (15, 65), (30, 100), (4, 28), (90, 54), (90, 58),
+               (95, 30), (34, 48), (13, 53), (93, 86)]
+    assert grid_closest_pair(points1) == inefficient_closest(points1)
+    assert set(closest_pair(points1)) == set(inefficient_closest(points1))
+
+    # k closest pairs come back sorted by distance
+    all_distances = sorted(dist(points1[i], points1[j])
+                           for i in range(len(points1)) for j in range(i + 1, len(points1)))
+    three_closest = grid_closest_pair(points1, k=3)
+    assert [dist(p1, p2) for p1, p2 in three_closest] == all_distances[:3]
+
+    # points in the unit square, where squared distances are smaller than distances
+    points2 = [(0.12, 0.53), (0.91, 0.07), (0.47, 0.45), (0.33, 0.98), (0.5, 0.51),
+               (0.76, 0.2), (0.05, 0.66), (0.58, 0.88), (0.69, 0.36), (0.28, 0.14)]
+    assert grid_closest_pair(points2) == inefficient_closest(points2)
+    assert set(closest_pair(points2)) == set(inefficient_closest(points2))
+
+    # repeated points are at distance 0
+    assert grid_closest_pair([(1, 1), (5, 5), (1, 1)]) == ((1, 1), (1, 1))
+
+    # tied distances go to the pair inefficient_closest finds first, whatever the shuffle
+    points3 = [(6, 4), (0, 5), (2, 2), (0, 6), (6, 0), (5, 0), (0, 2), (3, 4)]
+    points4 = [(2, 2), (7, 7), (2, 2), (4, 4), (7, 7), (4, 4), (2, 2)]
+    for _ in range(50):
+        assert grid_closest_pair(points3) == ((0, 5), (0, 6))
+        assert grid_closest_pair(points4) == inefficient_closest(points4) == ((2, 2), (2, 2))
+        assert grid_closest_pair(points4, k=3) == [((2, 2), (2, 2)), ((2, 2), (2, 2)), ((7, 7), (7, 7))]
+
+
+def test_grid_closest_pair_numpy():
+    np = pytest.importorskip("numpy")
+    points = np.array([(3, 81), (20, 30), (9, 48), (72, 83), (28, 20), (100, 21),
+                       (22, 12), (74, 40), (81, 76), (60, 12)])
+    assert grid_closest_pair(points) == inefficient_closest([tuple(p) for p in points.tolist()])
+
+
+def test_kd_tree():
+    points = [(3, 81), (20, 30), (9, 48), (72, 83), (28, 20), (100, 21),
+              (22, 12), (74, 40), (81, 76), (60, 12)]
+    tree = KDTree(points)
+    assert len(tree) == 10
+
+    assert tree.nearest((70, 80)) == (72, 83)
+    assert tree.k_nearest((25, 25), 3) == [(28, 20), (20, 30), (22, 12)]
+    assert sorted(tree.radius_query((25, 25), 10)) == [(20, 30), (28, 20)]
+    assert tree.batch_k_nearest([(0, 80), (100, 20)]) == [(3, 81), (100, 21)]
+
+    tree.delete((72, 83))
+    assert tree.nearest((70, 80)) == (81, 76)
+    tree.insert((69, 79))
+    assert tree.nearest((70, 80)) == (69, 79)
+    assert sorted(tree.all_points()) == sorted(points[:3] + points[4:] + [(69, 79)])
+
+    # every point's nearest neighbour other than itself is its partner in the closest pair
+    p1, p2 = inefficient_closest(points)
+    assert tree.k_nearest(p1, 2)[1] == p2
+
+
+def test_unimodal_max():
+    array1 = [1, 4, 9, 12, 15, 11, 7, 3, 2]
+    assert unimodal_max(array1) == 15
+    assert unimodal_max([5]) == 5
+    assert unimodal_max([1, 2, 3, 4]) == 4
+    assert unimodal_max([4, 3, 2, 1]) == 4
+
+    # works on index ranges of any buffer without slicing it
+    typed_array = array("q", array1)
+    assert unimodal_max(memoryview(typed_array), 5, 9) == 11
+    assert batch_unimodal_max(typed_array, [(0, 9), (0, 3), (4, 7)]) == [15, 9, 15]
+
+
+def test_equal_index():
+    assert equal_index([-3, -1, 2, 5, 7])
+    assert not equal_index([-3, -1, 1, 4, 7])
+    assert not equal_index([])
+
+    typed_array = array("q", [-3, -1, 2, 5, 7])
+    assert not equal_index(typed_array, lo=3, hi=5)
+    assert batch_equal_index(typed_array, [(0, 5), (0, 2), (2, 3)]) == [True, False, True]
+
+
 def test_quicksort():
     array1 = [22, 18, 21, 2, -18, -19, 16, -8, 6, -5]
     assert quicksort(array1) == sorted(array1)
@@ -73,6 +218,69 @@ def test_quicksort():
                      pivot_choice=median_pivot, num_steps=True) == 502
 
 
+def test_quicksort_partition_schemes():
+    array1 = [22, 18, 21, 2, -18, -19, 16, -8, 6, -5]
+    for partition in (three_way_partition, dual_pivot_partition):
+        for pivot_choice in (left_pivot, right_pivot, median_pivot):
+            assert quicksort(array1.copy(), pivot_choice, partition=partition) == sorted(array1)
+
+    quicksort_test2 = \
+        generate_tests.create_list("../test_cases/part1_test_cases/problem5.6test2.txt")
+    assert quicksort(quicksort_test2.copy(), partition=dual_pivot_partition) == \
+           sorted(quicksort_test2)
+
+    # with only a few distinct keys the single pivot partition does quadratic work,
+    # while the duplicate aware schemes don't
+    duplicates = [i % 3 for i in range(600)]
+    single_steps = quicksort(duplicates.copy(), pivot_choice=median_pivot, num_steps=True)
+    three_way_steps = quicksort(duplicates.copy(), pivot_choice=median_pivot, num_steps=True,
+                                partition=three_way_partition)
+    dual_pivot_steps = quicksort(duplicates.copy(), pivot_choice=median_pivot, num_steps=True,
+                                 partition=dual_pivot_partition)
+    assert single_steps > 50000
+    assert three_way_steps < 2000
+    assert dual_pivot_steps < 2000
+
+
+def test_introsort():
+    array1 = [22, 18, 21, 2, -18, -19, 16, -8, 6, -5]
+    assert introsort(array1.copy()) == sorted(array1)
+
+    quicksort_test3 = generate_tests.create_list("../test_cases/part1_test_cases/problem5.6.txt")
+    assert introsort(quicksort_test3.copy(), partition=three_way_partition) == \
+           sorted(quicksort_test3)
+
+    # sorted input with the left pivot recurses n levels deep in quicksort, which is far
+    # past the recursion limit here
+    already_sorted = list(range(20000))
+    assert introsort(already_sorted.copy(), pivot_choice=left_pivot) == already_sorted
+    assert introsort(already_sorted[::-1], pivot_choice=right_pivot) == already_sorted
+
+    all_equal = [7] * 5000
+    assert introsort(all_equal.copy()) == all_equal
+
+
+def test_parallel_sort():
+    quicksort_test3 = generate_tests.create_list("../test_cases/part1_test_cases/problem5.6.txt")
+    expected = sorted(quicksort_test3)
+    assert parallel_sort(quicksort_test3.copy(), processes=3) == expected
+    assert parallel_sort(quicksort_test3.copy(), pivot_choice=median_pivot, processes=2) == expected
+    assert parallel_sort(quicksort_test3.copy(), algorithm="mergesort", processes=4) == expected
+
+    # more processes than elements
+    assert parallel_sort([3, -1, 2], processes=8) == [-1, 2, 3]
+
+    # duplicate-heavy and presorted input, where every splitter can be the same value or
+    # the pivot is always the smallest entry of its bucket
+    duplicates = [random.randint(0, 3) for _ in range(5000)]
+    assert parallel_sort(duplicates.copy(), processes=2) == sorted(duplicates)
+    assert parallel_sort([7] * 5000, processes=4) == [7] * 5000
+    assert parallel_sort(list(range(20000)), pivot_choice=left_pivot, processes=2) == \
+        list(range(20000))
+    assert parallel_sort(list(range(20000, 0, -1)), pivot_choice=left_pivot, processes=3) == \
+        list(range(1, 20001))
+
+
 def test_select():
     array1 = [7, 3, 2, 10, 5, 4, 1, 6, 9, 8]
     assert select(array1, 5) == 5
@@ -84,3 +292,60 @@ def test_select():
     select_test2 = \
         generate_tests.create_list("../test_cases/part1_test_cases/problem6.5test2.txt")
     assert select(select_test2, 50) == 4715
+
+
+def test_dselect():
+    array1 = [7, 3, 2, 10, 5, 4, 1, 6, 9, 8]
+    assert dselect(array1, 5) == 5
+
+    select_test1 = \
+        generate_tests.create_list("../test_cases/part1_test_cases/problem6.5test1.txt")
+    assert dselect(select_test1, 5) == 5469
+
+    select_test2 = \
+        generate_tests.create_list("../test_cases/part1_test_cases/problem6.5test2.txt")
+    assert dselect(select_test2, 50) == 4715
+
+    # sorted input and duplicates are linear too
+    assert dselect(list(range(10000)), 9000) == 8999
+    assert dselect([4] * 1000, 500) == 4
+
+
+def test_multiselect():
+    select_test2 = \
+        generate_tests.create_list("../test_cases/part1_test_cases/problem6.5test2.txt")
+    expected = sorted(select_test2)
+    ranks = [50, 90, 99, 1, 100, 50]
+    assert multiselect(select_test2, ranks) == [expected[rank - 1] for rank in ranks]
+    assert multiselect(select_test2, [50])[0] == 4715
+
+
+def test_quantile_sketch():
+    quicksort_test3 = generate_tests.create_list("../test_cases/part1_test_cases/problem5.6.txt")
+    quantiles = [0, 0.01, 0.25, 0.5, 0.9, 0.99, 1]
+
+    sketch = QuantileSketch(error=0.02)
+    for value in quicksort_test3:
+        sketch.update(value)
+    assert sketch.size < len(quicksort_test3) // 10
+    for q, estimate, exact, rank_error in verify_quantile_sketch(sketch, quicksort_test3, quantiles):
+        assert rank_error <= 0.02
+
+    # sketches of the parts of a stream merge into a sketch of the whole stream
+    parts = [QuantileSketch(error=0.02) for _ in range(4)]
+    for i, value in enumerate(quicksort_test3):
+        parts[i % 4].update(value)
+    merged = parts[0]
+    for part in parts[1:]:
+        merged.merge(part)
+    assert merged.n == len(quicksort_test3)
+    for q, estimate, exact, rank_error in verify_quantile_sketch(merged, quicksort_test3, quantiles):
+        assert rank_error <= 0.02
+
+    # small streams are answered exactly
+    small_sketch = QuantileSketch()
+    select_test2 = \
+        generate_tests.create_list("../test_cases/part1_test_cases/problem6.5test2.txt")
+    for value in select_test2:
+        small_sketch.update(value)
+    assert small_sketch.quantile(0.5) == select(select_test2, 50) == 4715
@@ -1,7 +1,18 @@
+import asyncio
+import math
+import queue
+import random
+import threading
+from functools import partial
+
+import pytest
+
 from part2.chapter9 import UndirectedGraph, DirectedGraph
-from part2.chapter10 import heap_median_maintenance_sum
+from part2.chapter10 import MinHeap, DaryHeap, PairingHeap, RadixHeap, heap_median_maintenance_sum, \
+    sliding_window_median, sliding_window_percentile, BlockingPriorityQueue, AsyncPriorityQueue
 from part2.chapter11 import bst_median_maintenance_sum
-from part2.chapter12 import two_sum
+from part2.chapter12 import two_sum, sorted_two_sum, bucket_two_sum, IntHashTable, \
+    BloomFilter, CountingBloomFilter
 
 from tests import generate_tests
 
@@ -130,6 +141,10 @@ def test_efficient_dijkstra():
     assert dijkstra_test2.efficient_dijkstra(1) == \
            dijkstra_test2.dijkstra(1)
 
+    for queue_factory in (partial(DaryHeap, track_positions=True), PairingHeap, RadixHeap):
+        assert dijkstra_test2.efficient_dijkstra(1, queue_factory) == \
+               dijkstra_test2.dijkstra(1)
+
 
 med_main_test1 = \
     generate_tests.create_list("../test_cases/part2_test_cases/problem11.3test.txt")
@@ -137,11 +152,157 @@ med_main_test2 = \
     generate_tests.create_list("../test_cases/part2_test_cases/problem11.3.txt")
 
 
+def test_min_heap():
+    array = [5, 3, 9, 1, 1, 7, 2, 8]
+    heap = MinHeap(list(array))
+    assert [heap.extract_min() for _ in array] == sorted(array)
+
+    # keys are computed once when an element is added
+    calls = []
+    heap = MinHeap(key=lambda x: calls.append(x) or -x)
+    for x in array:
+        heap.add(x)
+    assert [heap.extract_min() for _ in array] == sorted(array, reverse=True)
+    assert calls == array
+    assert heap.handles is None
+
+    # handles stay valid as elements move, and work for duplicates
+    heap = MinHeap(track_positions=True)
+    handles = [heap.add(x) for x in [4, 4, 4, 9, 9]]
+    heap.decrease_key(handles[3], 1)
+    assert heap.get_min() == 9 and heap.extract_min() == 9
+    assert handles[3].index is None
+    heap.delete(handles[1])
+    assert all(handle.index == index for index, handle in enumerate(heap.handles))
+    assert [heap.extract_min() for _ in range(3)] == [4, 4, 9]
+    with pytest.raises(AttributeError):
+        heap.decrease_key(handles[1], 0)
+    with pytest.raises(ValueError):
+        heap.decrease_key(heap.add(5), 6)
+
+
+def test_priority_queues():
+    values = [random.randint(1, 100) for _ in range(500)]
+    for queue_factory in (partial(MinHeap, track_positions=True), partial(DaryHeap, track_positions=True),
+                          PairingHeap, RadixHeap):
+        priority_q = queue_factory(key=lambda x: x)
+        handles = [priority_q.add(value) for value in values]
+        # lower every third key to 0
+        for handle in handles[::3]:
+            priority_q.decrease_key(handle, 0)
+        extracted = [priority_q.extract_min() for _ in values]
+        assert sorted(extracted[:len(handles[::3])]) == sorted(values[::3])
+        assert extracted[len(handles[::3]):] == sorted(values[i] for i in range(len(values)) if i % 3)
+        assert priority_q.is_empty()
+
+    radix_heap = RadixHeap()
+    radix_heap.add(5)
+    radix_heap.extract_min()
+    with pytest.raises(ValueError):
+        radix_heap.add(3)
+
+    # get_min doesn't count as extracting, so smaller keys can still be added after it
+    radix_heap = RadixHeap()
+    radix_heap.add(10)
+    assert radix_heap.get_min() == 10
+    radix_heap.add(5)
+    radix_heap.add(float("inf"))
+    assert radix_heap.get_min() == 5
+    assert [radix_heap.extract_min() for _ in range(3)] == [5, 10, float("inf")]
+
+
 def test_heap_median_maintenance_sum():
     assert heap_median_maintenance_sum(med_main_test1) % 10000 == 9335
     assert heap_median_maintenance_sum(med_main_test2) % 10000 == 1213
 
 
+def test_sliding_window_percentile():
+    # with a window as long as the stream these are the prefix medians
+    assert sum(sliding_window_median(med_main_test2, len(med_main_test2))) == \
+           heap_median_maintenance_sum(med_main_test2)
+
+    samples = [5, 1, 4, 4, 2, 8, 8, 8, 3, 0, 7]
+    assert list(sliding_window_median(samples, 3)) == [5, 1, 4, 4, 4, 4, 8, 8, 8, 3, 3]
+
+    for window in (1, 4, 50):
+        for percentile in (0, 25, 90, 100):
+            expected = []
+            for i in range(len(med_main_test2)):
+                recent = sorted(med_main_test2[max(0, i - window + 1):i + 1])
+                expected.append(recent[max(1, math.ceil(percentile * len(recent) / 100)) - 1])
+            assert list(sliding_window_percentile(med_main_test2, window, percentile)) == expected
+
+    with pytest.raises(ValueError):
+        next(sliding_window_percentile(samples, 0))
+
+
+def test_blocking_priority_queue():
+    priority_q = BlockingPriorityQueue(key=lambda job: job[0], maxsize=4)
+    for job in [(2, "a"), (1, "b"), (2, "c"), (1, "d")]:
+        priority_q.put(job)
+    with pytest.raises(queue.Full):
+        priority_q.put((0, "e"), timeout=0.01)
+    # equal priorities come out in the order they were put
+    assert priority_q.get_many(3) == [(1, "b"), (1, "d"), (2, "a")]
+    assert priority_q.get() == (2, "c")
+    with pytest.raises(queue.Empty):
+        priority_q.get(block=False)
+
+    # producers are held back by the bound while consumers drain the queue. Consumers only
+    # stop once every producer has finished and the queue is empty, so a slow producer
+    # can't leave the others blocked on a full queue
+    priority_q = BlockingPriorityQueue(maxsize=10)
+    producers_done = threading.Event()
+    consumed = []
+
+    def produce():
+        for i in range(500):
+            priority_q.put(i)
+
+    def consume():
+        while not (producers_done.is_set() and priority_q.empty()):
+            try:
+                consumed.extend(priority_q.get_many(4, timeout=0.05))
+            except queue.Empty:
+                pass
+
+    producers = [threading.Thread(target=produce) for _ in range(3)]
+    consumers = [threading.Thread(target=consume) for _ in range(3)]
+    for thread in producers + consumers:
+        thread.start()
+    for thread in producers:
+        thread.join()
+    producers_done.set()
+    for thread in consumers:
+        thread.join()
+    assert sorted(consumed) == sorted(list(range(500)) * 3)
+
+
+def test_async_priority_queue():
+    async def run():
+        priority_q = AsyncPriorityQueue(maxsize=2)
+        await priority_q.put(5)
+        await priority_q.put(1)
+        with pytest.raises(TimeoutError):
+            await priority_q.put(3, timeout=0.01)
+
+        # a blocked put goes through once a consumer makes room
+        async def consume_later():
+            await asyncio.sleep(0.01)
+            return await priority_q.get()
+
+        consumer = asyncio.create_task(consume_later())
+        await priority_q.put(3, timeout=1)
+        assert await consumer == 1
+        assert await priority_q.get_many(5) == [3, 5]
+        with pytest.raises(TimeoutError):
+            await priority_q.get(timeout=0.01)
+        with pytest.raises(asyncio.QueueEmpty):
+            priority_q.get_nowait()
+
+    asyncio.run(run())
+
+
 def test_bst_median_maintenance_sum():
     assert bst_median_maintenance_sum(med_main_test1) % 10000 == 9335
     assert bst_median_maintenance_sum(med_main_test2) % 10000 == 1213
@@ -151,3 +312,86 @@ def test_two_sum():
     two_sum_test1 = \
         generate_tests.create_list("../test_cases/part2_test_cases/problem12.4test.txt")
     assert two_sum(two_sum_test1, range(3, 11)) == 8
+    assert two_sum(two_sum_test1, range(3, 11), compact=True) == 8
+
+
+def test_sorted_two_sum():
+    two_sum_test1 = \
+        generate_tests.create_list("../test_cases/part2_test_cases/problem12.4test.txt")
+    assert sorted_two_sum(two_sum_test1, range(3, 11)) == 8
+    assert bucket_two_sum(two_sum_test1, range(3, 11)) == 8
+
+    # pairs of equal values don't count, and neither do sums outside the range
+    array1 = [-3, 1, 1, 4, 5, 9, 9, 12]
+    for target_range in (range(-10, 30), range(2, 3), range(0, 20, 3), range(5, 5)):
+        assert sorted_two_sum(array1, target_range) == two_sum(array1, target_range)
+        assert bucket_two_sum(array1, target_range) == two_sum(array1, target_range)
+
+
+def test_int_hash_table():
+    table = IntHashTable(store_values=True)
+    for key in range(-50, 50, 3):
+        table.insert(key, key * 10)
+    assert len(table) == 34
+    assert table.capacity >= 68
+    assert table.get(-50) == -500
+    assert table.get(-49) is None
+    assert 49 in table and 50 not in table
+
+    table.insert(49, 7)
+    assert len(table) == 34 and table.get(49) == 7
+
+    # bulk operations take whole arrays, duplicates are only stored once
+    med_main_test2 = \
+        generate_tests.create_list("../test_cases/part2_test_cases/problem11.3.txt")
+    key_set = IntHashTable(load_factor=0.7)
+    key_set.add_many(med_main_test2)
+    assert len(key_set) == len(set(med_main_test2))
+    assert list(key_set.contains_many(med_main_test2)) == [True] * len(med_main_test2)
+    assert list(key_set.contains_many([-1, 0, 2 ** 62])) == [False, False, False]
+
+
+def test_bloom_filter(tmp_path):
+    med_main_test2 = \
+        generate_tests.create_list("../test_cases/part2_test_cases/problem11.3.txt")
+    bloom_filter = BloomFilter(len(med_main_test2), false_positive_rate=0.01)
+    bloom_filter.add_many(med_main_test2)
+    assert bloom_filter.num_hashes == 7
+
+    # no false negatives, and roughly the requested rate of false positives
+    assert all(bloom_filter.contains_many(med_main_test2))
+    absent = [key for key in range(-20000, 0)]
+    false_positives = sum(bloom_filter.contains_many(absent))
+    assert false_positives < 0.02 * len(absent)
+    assert sum(key in bloom_filter for key in absent) == false_positives
+
+    filename = tmp_path / "filter.bin"
+    bloom_filter.save(filename)
+    loaded = BloomFilter.load(filename)
+    assert len(loaded) == len(med_main_test2)
+    assert list(loaded.contains_many(absent)) == list(bloom_filter.contains_many(absent))
+
+    writable = BloomFilter.load(filename, writable=True)
+    writable.add(-1)
+    writable.flush()
+    assert -1 in BloomFilter.load(filename)
+    assert len(BloomFilter.load(filename)) == len(med_main_test2) + 1
+
+
+def test_counting_bloom_filter():
+    counting_filter = CountingBloomFilter(1000, false_positive_rate=0.001)
+    counting_filter.add_many(range(1000))
+    counting_filter.add(5000)
+    assert all(counting_filter.contains_many(range(1000))) and 5000 in counting_filter
+
+    counting_filter.remove_many(range(500))
+    counting_filter.remove(5000)
+    assert len(counting_filter) == 500
+    assert all(counting_filter.contains_many(range(500, 1000)))
+    assert sum(counting_filter.contains_many(range(500))) < 10
+
+    # removing absent keys in bulk fails without touching any counter
+    table = bytes(counting_filter.table)
+    with pytest.raises(AttributeError):
+        counting_filter.remove_many([600, 700, 10 ** 9])
+    assert bytes(counting_filter.table) == table and len(counting_filter) == 500
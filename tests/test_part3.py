@@ -1,6 +1,18 @@
+import random
+from collections import Counter
+from functools import partial
+from itertools import product
+
+import pytest
+
 from tests import generate_tests
-from part3.chapter13 import sum_weighted_completion_times, greedy_difference, greedy_ratio
-from part3.chapter14 import huffman_code, min_max_encoding_lengths
+from part2.chapter10 import DaryHeap, PairingHeap
+from part3.chapter13 import Job, sum_weighted_completion_times, greedy_difference, greedy_ratio, \
+    JobTable, IncrementalScheduler
+from part3.chapter14 import huffman_code, min_max_encoding_lengths, two_queue_huffman_code, \
+    get_encoding_lengths, HuffNode, canonical_codes, huffman_compress, huffman_decompress, \
+    huffman_compress_file, huffman_decompress_file, length_limited_code, length_limit_penalty, \
+    count_frequencies
 from part3.chapter16 import KnapsackItem, max_ind_set, \
     wis_reconstruction, knapsack_value, knapsack_reconstruction
 from part3.chapter17 import nw_score, reconstruction, verify_reconstruction, \
@@ -39,6 +51,55 @@ def test_greedy_ratio():
     assert sum_weighted_completion_times(ratio_schedule2) == 67311454237
 
 
+def test_job_table():
+    pytest.importorskip("numpy")
+    job_table1 = JobTable.from_file("../test_cases/part3_test_cases/problem13.4test.txt")
+    assert job_table1.to_jobs() == greedy_scheduling_test1
+    assert job_table1.greedy_ratio().sum_weighted_completion_times() == 67247
+
+    job_table2 = JobTable.from_file("../test_cases/part3_test_cases/problem13.4.txt")
+    assert len(job_table2) == 10000
+    assert job_table2.greedy_ratio().sum_weighted_completion_times() == 67311454237
+
+    # ties are broken the same way as the list versions
+    assert job_table2.greedy_difference().to_jobs() == greedy_difference(greedy_scheduling_test2)
+    assert job_table2.greedy_difference().sum_weighted_completion_times() == 69120882574
+    assert JobTable.from_jobs(greedy_scheduling_test2).greedy_ratio().to_jobs() == \
+           greedy_ratio(greedy_scheduling_test2)
+
+    # sums that don't fit in int64 are still exact
+    n = 3_000_000
+    assert JobTable([10 ** 4] * n, [10 ** 4] * n).sum_weighted_completion_times() == \
+        10 ** 8 * n * (n + 1) // 2 == 450000150000000000000
+    large_jobs = [Job(random.randint(1, 10 ** 9), random.randint(1, 10 ** 9)) for _ in range(1000)]
+    assert JobTable.from_jobs(large_jobs).sum_weighted_completion_times() == \
+        sum_weighted_completion_times(large_jobs)
+
+    # tables compare by identity, since comparing arrays elementwise has no single truth value
+    assert job_table1 == job_table1 and job_table1 != JobTable.from_jobs(greedy_scheduling_test1)
+
+
+def test_incremental_scheduler():
+    scheduler = IncrementalScheduler(greedy_scheduling_test1)
+    assert scheduler.total() == 67247
+    assert scheduler.jobs() == greedy_ratio(greedy_scheduling_test1)
+
+    scheduler = IncrementalScheduler()
+    handles = [scheduler.insert(job) for job in greedy_scheduling_test2]
+    assert scheduler.total() == 67311454237
+
+    # remove every other job and compare against a full recomputation
+    for i in range(0, len(handles), 2):
+        scheduler.delete(handles[i])
+    remaining = greedy_scheduling_test2[1::2]
+    assert len(scheduler) == len(remaining)
+    assert scheduler.jobs() == greedy_ratio(remaining)
+    assert scheduler.total() == sum_weighted_completion_times(greedy_ratio(remaining))
+
+    with pytest.raises(AttributeError):
+        scheduler.delete(handles[0])
+
+
 def test_huffman_codes():
     alphabet1 = generate_tests.create_alphabet("../test_cases/part3_test_cases/problem14.6test1.txt")
     huffman_code1 = huffman_code(alphabet1)
@@ -55,6 +116,100 @@ def test_huffman_codes():
     assert min_max_encoding_lengths(huffman_code3) == (9, 19)
 
 
+def test_two_queue_huffman_code():
+    alphabet1 = generate_tests.create_alphabet("../test_cases/part3_test_cases/problem14.6test1.txt")
+    huffman_tree1 = two_queue_huffman_code(alphabet1)
+    assert min_max_encoding_lengths(huffman_tree1) == (2, 5)
+
+    alphabet3 = generate_tests.create_alphabet("../test_cases/part3_test_cases/problem14.6.txt")
+    huffman_tree3 = two_queue_huffman_code(alphabet3)
+    frequencies = [symbol.frequency for symbol in alphabet3]
+    min_length, max_length, _, weighted_length = huffman_tree3.encoding_length_stats(frequencies)
+    assert (min_length, max_length) == (9, 19)
+
+    # same cost as the heap based construction
+    encoding_lengths = get_encoding_lengths(huffman_code(list(alphabet3)))
+    assert weighted_length == \
+           sum(encoding_lengths[symbol.symbol] * symbol.frequency for symbol in alphabet3) / sum(frequencies)
+
+    # presorted alphabets skip the sort, and deep trees don't hit the recursion limit
+    skewed_alphabet = [HuffNode(str(i), 2 ** i) for i in range(5000)]
+    assert two_queue_huffman_code(skewed_alphabet, presorted=True).encoding_length_stats()[:2] == (1, 4999)
+
+
+def test_canonical_huffman(tmp_path):
+    alphabet = generate_tests.create_alphabet("../test_cases/part3_test_cases/problem14.6test1.txt")
+    encoding_lengths = get_encoding_lengths(huffman_code(alphabet))
+    codes = canonical_codes(encoding_lengths)
+    assert {symbol: length for symbol, (_, length) in codes.items()} == encoding_lengths
+    bit_strings = [format(code, f"0{length}b") for code, length in codes.values()]
+    assert not any(a != b and b.startswith(a) for a in bit_strings for b in bit_strings)
+
+    for data in [b"", b"a", b"aaaa", bytes(range(256)) * 3,
+                 b"GET /index.html 200\nPOST /login 302\nGET /index.html 404\n" * 100]:
+        compressed = huffman_compress(data)
+        assert huffman_decompress(compressed) == data
+
+    # streaming with a chunk size that splits codes across chunks
+    data = bytes(range(200)) + b"abracadabra" * 5000
+    (tmp_path / "input").write_bytes(data)
+    huffman_compress_file(tmp_path / "input", tmp_path / "compressed", chunk_size=1000)
+    assert (tmp_path / "compressed").stat().st_size < len(data)
+    huffman_decompress_file(tmp_path / "compressed", tmp_path / "output", chunk_size=7)
+    assert (tmp_path / "output").read_bytes() == data
+
+    with pytest.raises(ValueError):
+        huffman_decompress(huffman_compress(b"aaaa")[:-1] + b"\xff")
+
+
+def test_length_limited_code():
+    alphabet = generate_tests.create_alphabet("../test_cases/part3_test_cases/problem14.6.txt")
+    for max_length in (10, 12, 15):
+        encoding_lengths = length_limited_code(alphabet, max_length)
+        assert max(encoding_lengths.values()) == max_length
+        assert sum(2 ** -length for length in encoding_lengths.values()) <= 1
+
+    # no penalty once the limit is at least the Huffman code's max length
+    assert length_limit_penalty(alphabet, 19)[2] == 0
+    limited, unconstrained, penalty = length_limit_penalty(alphabet, 12)
+    assert 0 < penalty < 0.02 and limited > unconstrained
+
+    # optimal against brute force over every length assignment on a small skewed alphabet
+    small_alphabet = [HuffNode(str(i), 2 ** i) for i in range(5)]
+    encoding_lengths = length_limited_code(small_alphabet, 3)
+    best = min(sum(length * node.frequency for length, node in zip(lengths, small_alphabet))
+               for lengths in product(range(1, 4), repeat=5)
+               if sum(2 ** -length for length in lengths) <= 1)
+    assert sum(encoding_lengths[node.symbol] * node.frequency for node in small_alphabet) == best
+
+    with pytest.raises(ValueError):
+        length_limited_code(alphabet, 9)
+
+    data = bytes(range(256)) + b"a" * 100000
+    assert huffman_decompress(huffman_compress(data, max_length=9)) == data
+
+
+def test_count_frequencies(tmp_path):
+    text = b"the quick brown fox jumps over the lazy dog\nthe end\n" * 1000
+    (tmp_path / "a.txt").write_bytes(text)
+    (tmp_path / "b.txt").write_bytes(b"the fox")
+    (tmp_path / "empty.txt").write_bytes(b"")
+    filenames = [tmp_path / "a.txt", tmp_path / "b.txt", tmp_path / "empty.txt"]
+
+    reports = []
+    alphabet = count_frequencies(filenames, chunk_size=1000, processes=2,
+                                 progress=lambda done, total, seconds: reports.append((done, total)))
+    expected = Counter(text + b"the fox")
+    assert {node.symbol: node.frequency for node in alphabet} == expected
+    assert reports[-1] == (len(text) + 7, len(text) + 7)
+
+    # chunk boundaries never split a token
+    alphabet = count_frequencies(filenames, tokens=True, chunk_size=1000, processes=2, progress=None)
+    expected = Counter(token.decode() for token in (text + b" the fox").split())
+    assert {node.symbol: node.frequency for node in alphabet} == expected
+    assert min_max_encoding_lengths(huffman_code(alphabet)) == (2, 4)
+
+
 mst_test1 = \
     generate_tests.create_mst_graph("../test_cases/part3_test_cases/problem15.9test.txt")
 
@@ -79,6 +234,9 @@ def test_efficient_prim():
     tree2 = mst_test2.efficient_prim()
     assert tree2.size() == -3612829
 
+    for queue_factory in (partial(DaryHeap, track_positions=True), PairingHeap):
+        assert mst_test2.efficient_prim(queue_factory).size() == -3612829
+
 
 def test_kruskal():
     tree1 = mst_test1.kruskal()